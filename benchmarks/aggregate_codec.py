@@ -0,0 +1,41 @@
+"""
+Compare the generic eth_abi path against the direct multicall envelope encoder/decoder
+Usage: python benchmarks/aggregate_codec.py [calls] [rounds]
+"""
+import sys
+import time
+
+from eth_abi import encode
+
+from w3multicall.multicall import W3Multicall, _encode_data, _decode_output, _encode_aggregate_data, _decode_aggregate_output
+
+
+def bench(label, func, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print("{:<32} {:.6f}s".format(label, best))
+    return best
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    balance_of = W3Multicall.CallTemplate.of('balanceOf(address)(uint256)')
+    calls = [balance_of.call('0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48', '0x{:040x}'.format(i + 1)) for i in range(count)]
+    args = [[[call.address, call.data] for call in calls]]
+    response = encode(['uint256', 'bytes[]'], [17000000, [encode(['uint256'], [i]) for i in range(count)]])
+
+    assert _encode_data(W3Multicall.MULTICALL_SELECTOR, W3Multicall.MULTICALL_INPUT_TYPES, args) == _encode_aggregate_data(W3Multicall.MULTICALL_SELECTOR, calls)
+    assert list(_decode_output(response, W3Multicall.MULTICALL_OUTPUT_TYPES)[1]) == [bytes(v) for v in _decode_aggregate_output(response)[1]]
+
+    print("{} calls, best of {} rounds".format(count, rounds))
+    encode_generic = bench("encode eth_abi", lambda: _encode_data(W3Multicall.MULTICALL_SELECTOR, W3Multicall.MULTICALL_INPUT_TYPES, args), rounds)
+    encode_direct = bench("encode direct", lambda: _encode_aggregate_data(W3Multicall.MULTICALL_SELECTOR, calls), rounds)
+    decode_generic = bench("decode eth_abi", lambda: _decode_output(response, W3Multicall.MULTICALL_OUTPUT_TYPES), rounds)
+    decode_direct = bench("decode direct", lambda: _decode_aggregate_output(response), rounds)
+    print("encode speedup x{:.1f}, decode speedup x{:.1f}".format(encode_generic / encode_direct, decode_generic / decode_direct))
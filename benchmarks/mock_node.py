@@ -0,0 +1,341 @@
+"""
+Local stand-in JSON-RPC node serving multicall3 (aggregate, tryAggregate, aggregate3) over Python fake contracts
+Usage: python -m benchmarks.mock_node [port]
+"""
+from typing import Dict, Tuple, Callable, Any, Union, Optional
+import sys
+import json
+import time
+import random
+import threading
+import http.server
+
+import eth_utils
+from eth_abi import encode, decode
+
+from w3multicall.multicall import W3Multicall
+
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+
+class ContractError(Exception):
+    pass
+
+
+class MockNode:
+    """
+    Threaded HTTP JSON-RPC server. Fake contract methods are Python functions called with (block number, *args)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0, jitter: float = 0, rate: Union[float, None] = None, error_rate: float = 0,
+                 max_response_bytes: Union[int, None] = None, gas_limit: Union[int, None] = None, gas_per_call: int = 30000, block_time: Union[float, None] = None,
+                 multicall_address: str = MULTICALL3_ADDRESS, seed: Union[int, None] = None):
+        """
+        :param host: (default 127.0.0.1) listening host
+        :param port: (default 0) listening port (0 picks a free port)
+        :param latency: (default 0) delay in seconds added to each HTTP request
+        :param jitter: (default 0) uniform random delay in seconds added on top of latency
+        :param rate: (optional) max HTTP requests per second, above which the node answers 429
+        :param error_rate: (default 0) probability of answering a JSON-RPC request with an error
+        :param max_response_bytes: (optional) eth_call return data size above which the node answers a size error
+        :param gas_limit: (optional) eth_call gas cap, above which the node answers an out of gas error
+        :param gas_per_call: (default 30000) gas used by each call of a multicall
+        :param block_time: (optional) seconds between blocks (default: blocks are only mined with mine())
+        :param multicall_address: (default multicall3 address) address of the multicall contract
+        :param seed: (optional) seed of the latency jitter and error injection
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.error_rate = error_rate
+        self.max_response_bytes = max_response_bytes
+        self.gas_limit = gas_limit
+        self.gas_per_call = gas_per_call
+        self.block_time = block_time
+        self.multicall_address = multicall_address.lower()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.contracts: Dict[Tuple[str, bytes], Tuple[W3Multicall.CallTemplate, Callable[..., Any]]] = {}
+        self.block_number = 0
+        self.fork = 0
+        self.block_hashes = {0: self.__block_hash(0)}
+        self.genesis_time = time.time()
+        self.tokens = 1 if rate is None else rate
+        self.updated_at = time.time()
+        self.stats = {'requests': 0, 'eth_calls': 0, 'calls': 0, 'errors': 0, 'rate_limited': 0}
+
+        node = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status, response = node.handle(body)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread: Union[threading.Thread, None] = None
+
+    def __repr__(self):
+        return "MockNode({})".format(self.endpoint_uri)
+
+    def __enter__(self) -> 'MockNode':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def endpoint_uri(self) -> str:
+        host, port = self.server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def start(self) -> 'MockNode':
+        self.thread = threading.Thread(target=self.server.serve_forever, name='MockNode', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def register(self, address: str, signature: str, func: Callable[..., Any]):
+        """
+        Register a fake contract method
+        :param address: contract address
+        :param signature: method signature (Example: 'balanceOf(address)(uint256)')
+        :param func: function called with (block number, *decoded args) returning the output values (a single value if there is one output)
+        """
+        template = W3Multicall.CallTemplate.of(signature)
+        with self.lock:
+            self.contracts[(address.lower(), template.selector)] = (template, func)
+
+    def __block_hash(self, block: int) -> bytes:
+        return eth_utils.keccak(text='{}|{}|{}'.format(id(self), self.fork, block))
+
+    def mine(self, blocks: int = 1) -> int:
+        """
+        :return: new head block number
+        """
+        with self.lock:
+            for _ in range(blocks):
+                self.block_number += 1
+                self.block_hashes[self.block_number] = self.__block_hash(self.block_number)
+            return self.block_number
+
+    def reorg(self, depth: int, blocks: Union[int, None] = None) -> int:
+        """
+        Replace the last depth blocks by a fork (new hashes, fork incremented). Results registered as functions of node.fork change accordingly
+        :param depth: number of blocks replaced
+        :param blocks: (default depth) length of the fork
+        :return: new head block number
+        """
+        with self.lock:
+            ancestor = max(0, self.block_number - depth)
+            for block in range(ancestor + 1, self.block_number + 1):
+                del self.block_hashes[block]
+            self.fork += 1
+            self.block_number = ancestor + (depth if blocks is None else blocks)
+            for block in range(ancestor + 1, self.block_number + 1):
+                self.block_hashes[block] = self.__block_hash(block)
+            return self.block_number
+
+    def __head(self) -> int:
+        if self.block_time is not None:
+            target = int((time.time() - self.genesis_time) / self.block_time)
+            if target > self.block_number:
+                self.mine(target - self.block_number)
+        return self.block_number
+
+    def __resolve_block(self, block_identifier: Any) -> int:
+        head = self.__head()
+        if block_identifier in (None, 'latest', 'pending', 'safe', 'finalized'):
+            return head
+        if block_identifier == 'earliest':
+            return 0
+        if isinstance(block_identifier, dict):
+            block_identifier = block_identifier.get('blockHash', block_identifier.get('blockNumber'))
+        if isinstance(block_identifier, str) and len(block_identifier) == 66:
+            block_hash = bytes.fromhex(block_identifier[2:])
+            for number, known in self.block_hashes.items():
+                if known == block_hash:
+                    return number
+            raise ContractError("unknown block")
+        block = int(block_identifier, 16) if isinstance(block_identifier, str) else int(block_identifier)
+        if block > head:
+            raise ContractError("header not found")
+        return block
+
+    def __acquire_rate(self) -> bool:
+        if self.rate is None:
+            return True
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+    def __call_contract(self, block: int, address: str, data: bytes) -> bytes:
+        entry = self.contracts.get((address.lower(), bytes(data[:4])))
+        if entry is None:
+            raise ContractError("execution reverted")
+        template, func = entry
+        args = decode(template.input_types, bytes(data[4:])) if template.input_types else ()
+        output = func(block, *args)
+        return encode(template.output_types, list(output) if len(template.output_types) > 1 else [output])
+
+    def __try_call_contract(self, block: int, address: str, data: bytes) -> Tuple[bool, bytes]:
+        try:
+            return True, self.__call_contract(block, address, data)
+        except Exception:
+            return False, b''
+
+    def __multicall(self, block: int, data: bytes) -> bytes:
+        selector, body = bytes(data[:4]), bytes(data[4:])
+        if selector == W3Multicall.MULTICALL_SELECTOR:
+            (calls,) = decode(W3Multicall.MULTICALL_INPUT_TYPES, body)
+            self.__charge_gas(len(calls))
+            return encode(W3Multicall.MULTICALL_OUTPUT_TYPES, [block, [self.__call_contract(block, address, call_data) for address, call_data in calls]])
+        if selector == W3Multicall.TRY_AGGREGATE_SELECTOR:
+            require_success, calls = decode(W3Multicall.TRY_AGGREGATE_INPUT_TYPES, body)
+            self.__charge_gas(len(calls))
+            results = []
+            for address, call_data in calls:
+                result = self.__try_call_contract(block, address, call_data)
+                if require_success and not result[0]:
+                    raise ContractError("execution reverted: Multicall3: call failed")
+                results.append(result)
+            return encode(W3Multicall.TRY_AGGREGATE_OUTPUT_TYPES, [results])
+        if selector == W3Multicall.AGGREGATE3_SELECTOR:
+            (calls,) = decode(W3Multicall.AGGREGATE3_INPUT_TYPES, body)
+            self.__charge_gas(len(calls))
+            results = []
+            for address, allow_failure, call_data in calls:
+                result = self.__try_call_contract(block, address, call_data)
+                if not allow_failure and not result[0]:
+                    raise ContractError("execution reverted: Multicall3: call failed")
+                results.append(result)
+            return encode(W3Multicall.AGGREGATE3_OUTPUT_TYPES, [results])
+        raise ContractError("execution reverted")
+
+    def __charge_gas(self, calls: int):
+        with self.lock:
+            self.stats['calls'] += calls
+        if self.gas_limit is not None and calls * self.gas_per_call > self.gas_limit:
+            raise ContractError("out of gas: gas required exceeds allowance ({})".format(self.gas_limit))
+
+    def __eth_call(self, params: list) -> str:
+        with self.lock:
+            self.stats['eth_calls'] += 1
+        transaction = params[0]
+        block = self.__resolve_block(params[1] if len(params) > 1 else 'latest')
+        data = bytes.fromhex(transaction.get('data', transaction.get('input', '0x'))[2:])
+        if transaction['to'].lower() == self.multicall_address:
+            output = self.__multicall(block, data)
+        else:
+            output = self.__call_contract(block, transaction['to'], data)
+        if self.max_response_bytes is not None and len(output) > self.max_response_bytes:
+            raise ContractError("response size exceeded ({} > {} bytes)".format(len(output), self.max_response_bytes))
+        return '0x' + output.hex()
+
+    def __get_block(self, params: list) -> Optional[dict]:
+        try:
+            block = self.__resolve_block(params[0])
+        except ContractError:
+            return None
+        return {
+            'number': hex(block),
+            'hash': '0x' + self.block_hashes[block].hex(),
+            'parentHash': '0x' + (self.block_hashes[block - 1] if block > 0 else b'\x00' * 32).hex(),
+            'timestamp': hex(int(self.genesis_time) + block),
+            'transactions': [],
+        }
+
+    def handle_request(self, request: dict) -> dict:
+        """
+        :return: JSON-RPC response of a single JSON-RPC request
+        """
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        try:
+            if self.error_rate and self.random.random() < self.error_rate:
+                raise Exception("injected error")
+            method, params = request.get('method'), request.get('params', [])
+            if method == 'eth_call':
+                response['result'] = self.__eth_call(params)
+            elif method == 'eth_blockNumber':
+                response['result'] = hex(self.__head())
+            elif method == 'eth_chainId':
+                response['result'] = hex(1337)
+            elif method == 'net_version':
+                response['result'] = '1337'
+            elif method == 'eth_getBlockByNumber' or method == 'eth_getBlockByHash':
+                response['result'] = self.__get_block(params)
+            else:
+                response['error'] = {'code': -32601, 'message': 'method not found: {}'.format(method)}
+        except ContractError as e:
+            response['error'] = {'code': 3 if 'reverted' in str(e) else -32000, 'message': str(e)}
+        except Exception as e:
+            response['error'] = {'code': -32603, 'message': str(e)}
+        if 'error' in response:
+            with self.lock:
+                self.stats['errors'] += 1
+        return response
+
+    def handle(self, body: bytes) -> Tuple[int, bytes]:
+        """
+        :return: HTTP status and body answering a raw HTTP JSON-RPC body
+        """
+        with self.lock:
+            self.stats['requests'] += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if not self.__acquire_rate():
+            with self.lock:
+                self.stats['rate_limited'] += 1
+            return 429, b'{"jsonrpc":"2.0","id":null,"error":{"code":-32005,"message":"Too Many Requests"}}'
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return 400, b'{"jsonrpc":"2.0","id":null,"error":{"code":-32700,"message":"Parse error"}}'
+        if isinstance(request, list):
+            return 200, json.dumps([self.handle_request(r) for r in request]).encode()
+        return 200, json.dumps(self.handle_request(request)).encode()
+
+
+def erc20_node(tokens: int = 10, **kwargs) -> MockNode:
+    """
+    MockNode with fake ERC20 tokens at 0x00..01 to 0x00..{tokens}. balanceOf(holder) depends on the holder and the block
+    """
+    node = MockNode(**kwargs)
+    for i in range(1, tokens + 1):
+        address = '0x{:040x}'.format(i)
+        node.register(address, 'balanceOf(address)(uint256)', lambda block, holder, i=i: int(holder, 16) * i + block)
+        node.register(address, 'totalSupply()(uint256)', lambda block, i=i: 10 ** 24 * i)
+        node.register(address, 'decimals()(uint8)', lambda block: 18)
+        node.register(address, 'symbol()(string)', lambda block, i=i: 'TOKEN{}'.format(i))
+        node.register(address, 'getReserves()(uint112,uint112,uint32)', lambda block, i=i: (10 ** 18 * i, 10 ** 18 * (block + 1), block))
+    return node
+
+
+if __name__ == "__main__":
+    with erc20_node(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8545, block_time=1) as mock_node:
+        print("Serving {}".format(mock_node.endpoint_uri))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,188 @@
+"""
+Offline throughput and latency benchmarks against a local MockNode. Results are written as JSON to track regressions
+Usage: python -m benchmarks.suite [--quick] [--output results.json] [--latency 0.02]
+"""
+from typing import List, Dict, Any, Callable
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import importlib.util
+import itertools
+import threading
+import statistics
+
+from w3multicall.multicall import W3Multicall, _encode_data, _decode_output, _encode_aggregate_data, _decode_aggregate_output
+from w3multicall.w3.w3 import W3, W3Pool
+from w3multicall.w3.http_transport import W3HTTPTransport
+from w3multicall.threading.w3multicall_executor import W3MulticallExecutor
+from w3multicall.columnar import decode_columns
+
+from .mock_node import erc20_node, MULTICALL3_ADDRESS
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def percentile(p: float) -> float:
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    return {'mean': statistics.fmean(samples), 'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99), 'max': samples[-1]}
+
+
+def best_of(func: Callable[[], Any], rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def holders(count: int) -> List[str]:
+    return ['0x{:040x}'.format(i + 1) for i in range(count)]
+
+
+def balance_calls(count: int, tokens: int = 10) -> List[W3Multicall.Call]:
+    template = W3Multicall.CallTemplate.of('balanceOf(address)(uint256)')
+    return [template.call('0x{:040x}'.format(i % tokens + 1), holder) for i, holder in enumerate(holders(count))]
+
+
+def bench_call_construction(count: int, rounds: int) -> List[dict]:
+    addresses = holders(count)
+    template = W3Multicall.CallTemplate.of('balanceOf(address)(uint256)')
+    results = []
+    for name, func in (('signature', lambda: [W3Multicall.Call(MULTICALL3_ADDRESS, 'balanceOf(address)(uint256)', a) for a in addresses]),
+                       ('template', lambda: [template.call(MULTICALL3_ADDRESS, a) for a in addresses])):
+        elapsed = best_of(func, rounds)
+        results.append({'name': 'call_construction', 'params': {'variant': name, 'calls': count}, 'metrics': {'seconds': elapsed, 'calls_per_second': count / elapsed}})
+    return results
+
+
+def bench_codec(count: int, rounds: int) -> List[dict]:
+    calls = balance_calls(count)
+    args = [[[call.address, call.data] for call in calls]]
+    response = _encode_data(b'', ['uint256', 'bytes[]'], [17000000, [(i).to_bytes(32, 'big') for i in range(count)]])
+    template = W3Multicall.CallTemplate.of('balanceOf(address)(uint256)')
+    _, outputs = _decode_aggregate_output(response)
+    cases = (
+        ('encode_data', lambda: _encode_data(W3Multicall.MULTICALL_SELECTOR, W3Multicall.MULTICALL_INPUT_TYPES, args)),
+        ('encode_aggregate', lambda: _encode_aggregate_data(W3Multicall.MULTICALL_SELECTOR, calls)),
+        ('decode_output', lambda: _decode_output(response, W3Multicall.MULTICALL_OUTPUT_TYPES)),
+        ('decode_aggregate', lambda: _decode_aggregate_output(response)),
+        ('decode_call_outputs', lambda: [_decode_output(output, template.output_types, None, True, template.decoder) for output in outputs]),
+    )
+    if importlib.util.find_spec('numpy') is not None:
+        cases += (('decode_columns', lambda: decode_columns(template.output_types, outputs)),)
+    results = []
+    for name, func in cases:
+        elapsed = best_of(func, rounds)
+        results.append({'name': 'codec', 'params': {'variant': name, 'calls': count}, 'metrics': {'seconds': elapsed, 'calls_per_second': count / elapsed}})
+    return results
+
+
+def bench_multicall_latency(node, sizes: List[int], rounds: int) -> List[dict]:
+    transports = [('raw_http', W3HTTPTransport(node.endpoint_uri))]
+    try:
+        from web3 import Web3
+        transports.append(('web3', Web3(Web3.HTTPProvider(node.endpoint_uri))))
+    except ImportError:
+        pass
+    results = []
+    for (name, web3), size in itertools.product(transports, sizes):
+        w3_multicall = W3Multicall(web3, MULTICALL3_ADDRESS, balance_calls(size))
+        w3_multicall.call()  # warm up the connection
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            w3_multicall.call()
+            samples.append(time.perf_counter() - start)
+        results.append({'name': 'multicall_latency', 'params': {'transport': name, 'calls': size}, 'metrics': percentiles(samples)})
+    return results
+
+
+def bench_executor(node, count: int, clients: int, grid: Dict[str, List[Any]]) -> List[dict]:
+    results = []
+    for processes, batch_max_size, tick_duration in itertools.product(grid['processes'], grid['batch_max_size'], grid['tick_duration']):
+        transport = W3HTTPTransport(node.endpoint_uri, pool_maxsize=processes)
+        w3_pool = W3Pool([W3(transport, rate=1000000, burst=1000000)], None)
+        calls = balance_calls(count)
+        latencies: List[float] = []
+        errors = [0]
+        lock = threading.Lock()
+        requests_before = node.stats['requests']
+        with W3MulticallExecutor(w3_pool, processes, MULTICALL3_ADDRESS, batch_max_size=batch_max_size, tick_duration=tick_duration, dedup=False) as executor:
+
+            def client(client_calls: List[W3Multicall.Call]):
+                submitted = [(time.perf_counter(), executor.submit(call)) for call in client_calls]
+                for submit_time, future in submitted:
+                    try:
+                        future.get()
+                        elapsed = time.perf_counter() - submit_time
+                        with lock:
+                            latencies.append(elapsed)
+                    except Exception:
+                        with lock:
+                            errors[0] += 1
+
+            start = time.perf_counter()
+            threads = [threading.Thread(target=client, args=(calls[i::clients],)) for i in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        transport.close()
+        metrics = {'seconds': elapsed, 'calls_per_second': count / elapsed, 'errors': errors[0], 'http_requests': node.stats['requests'] - requests_before}
+        metrics.update({'latency_' + k: v for k, v in percentiles(latencies).items()})
+        results.append({'name': 'executor', 'params': {'processes': processes, 'batch_max_size': batch_max_size, 'tick_duration': tick_duration, 'calls': count, 'clients': clients},
+                        'metrics': metrics})
+    return results
+
+
+def run(quick: bool = False, latency: float = 0.02) -> dict:
+    """
+    :param quick: (default False) small sizes and grid
+    :param latency: (default 0.02) simulated node latency in seconds
+    :return: {'meta': {...}, 'results': [{'name', 'params', 'metrics'}]}
+    """
+    count = 2000 if quick else 20000
+    rounds = 3 if quick else 5
+    grid = {'processes': [2, 8], 'batch_max_size': [20, 100], 'tick_duration': [0.01]} if quick else \
+        {'processes': [1, 4, 16], 'batch_max_size': [20, 100, 500], 'tick_duration': [0.005, 0.05]}
+    results = bench_call_construction(count, rounds) + bench_codec(count, rounds)
+    with erc20_node(latency=latency) as node:
+        results += bench_multicall_latency(node, [1, 50, 500] if quick else [1, 50, 500, 2000], 10 if quick else 30)
+        results += bench_executor(node, 1000 if quick else 5000, 4, grid)
+    try:
+        from importlib.metadata import version
+        library_version = version('w3multicall')
+    except Exception:
+        library_version = None
+    return {
+        'meta': {'timestamp': datetime.datetime.utcnow().isoformat() + 'Z', 'python': sys.version.split()[0], 'platform': platform.platform(), 'w3multicall': library_version,
+                 'node_latency': latency, 'quick': quick},
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='w3multicall benchmarks')
+    parser.add_argument('--quick', action='store_true', help='small sizes and grid')
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated node latency in seconds')
+    parser.add_argument('--output', default=None, help='JSON output file (default stdout)')
+    arguments = parser.parse_args()
+
+    report = run(arguments.quick, arguments.latency)
+    for result in report['results']:
+        print("{:<18} {:<80} {}".format(result['name'], json.dumps(result['params']), json.dumps({k: round(v, 6) for k, v in result['metrics'].items()})), file=sys.stderr)
+    if arguments.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(arguments.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,35 @@
+import asyncio
+from web3 import AsyncWeb3
+from w3multicall.multicall import W3Multicall, AsyncW3Multicall
+from w3multicall.w3.w3 import W3, AsyncW3Pool
+from w3multicall.asyncio.async_w3multicall_executor import AsyncW3MulticallExecutor
+
+
+async def main():
+    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider('https://ethereum.publicnode.com'))
+
+    w3_multicall = AsyncW3Multicall(w3)
+    w3_multicall.add(W3Multicall.Call(
+        '0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2',  # WETH contract address
+        'totalSupply()(uint256)'  # method to call
+        )
+    )
+    results = await w3_multicall.call()
+    print("The current supply of WETH is {:.2f}".format(results[0] / 10 ** 18))
+
+    w3_pool = AsyncW3Pool([
+        W3(AsyncWeb3(AsyncWeb3.AsyncHTTPProvider('https://ethereum.publicnode.com')), delay_between_call=1),
+        W3(AsyncWeb3(AsyncWeb3.AsyncHTTPProvider('https://rpc.flashbots.net/')), delay_between_call=1)
+    ])
+
+    executor = AsyncW3MulticallExecutor(w3_pool, concurrency=len(w3_pool.w3s))
+
+    owner_of = W3Multicall.CallTemplate.of('ownerOf(uint256)(address)')
+    bayc_futures = [executor.submit(owner_of.call('0xBC4CA0EdA7647A8aB7C2061c2E118A18a936f13D', i)) for i in range(1, 10)]  # BAYC NFT contract address
+
+    for i, owner in enumerate(await asyncio.gather(*bayc_futures)):
+        print("The owner of the BAYC Nº{} is {}".format(i + 1, owner))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
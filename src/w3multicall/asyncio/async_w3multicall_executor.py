@@ -0,0 +1,285 @@
+from typing import List, Dict, Union, Tuple, Set, Any, Optional
+import logging
+import asyncio
+import time
+
+from ..multicall import W3Multicall, AsyncW3Multicall
+from ..cache import W3MulticallCache
+from ..metrics import W3MulticallMetrics
+from ..w3.w3 import W3, AsyncW3Pool
+from ..batching import W3MulticallBatcher, _is_provider_error
+
+
+class AsyncW3MulticallExecutor(W3MulticallBatcher):
+    """
+    asyncio W3Multicall processor. Must be used from within a running event loop
+    """
+
+    class Task(W3MulticallBatcher.Task):
+        def __init__(self, block_identifier: Any = None, priority: int = 1):
+            super().__init__(block_identifier, priority)
+            self.flush_handle: Union[asyncio.TimerHandle, None] = None
+            self.w3_deadlines: Dict[int, List[Union[float, None]]] = {}
+
+        def set_result(self, key: int, result):
+            for future in self.w3_futures[key]:
+                if not future.done():
+                    future.set_result(result)
+
+        def set_exception(self, key: int, exception: Exception):
+            for future in self.w3_futures[key]:
+                if not future.done():
+                    future.set_exception(exception)
+
+        def live_items(self, now: float) -> List[Tuple[int, W3Multicall.Call]]:
+            """
+            Fail the expired Futures and return the calls still awaited by a Future
+            """
+            items = []
+            for k, call in self.w3_calls.items():
+                live = False
+                for future, deadline in zip(self.w3_futures[k], self.w3_deadlines[k]):
+                    if future.done():
+                        continue
+                    if deadline is not None and now >= deadline:
+                        future.set_exception(asyncio.TimeoutError("Deadline of call {} exceeded before it was sent".format(call)))
+                    else:
+                        live = True
+                if live:
+                    items.append((k, call))
+            return items
+
+    def __init__(self, w3_pool: AsyncW3Pool, concurrency: int, multicall_contract_address='0xcA11bde05977b3631167028862bE2a173976CA11', batch_max_size: int = 20, tick_duration: float = 0.05, logger: Union[logging.Logger, None] = None,
+                 require_success: bool = True, method: str = W3Multicall.AGGREGATE, batch_max_bytes: Union[int, None] = None, batch_max_gas: Union[int, None] = None, default_call_gas: int = 50000,
+                 dedup: bool = True, cache: Optional[W3MulticallCache] = None, chain_id: Any = None, metrics: Optional[W3MulticallMetrics] = None,
+                 lane_lingers: Optional[Dict[int, float]] = None):
+        """
+        :param w3_pool: AsyncW3Pool
+        :param concurrency: max number of W3Multicall in flight
+        :param multicall_contract_address: (optional) address of the multicall3.sol contract
+        :param batch_max_size: (default 20) max call per W3Multicall
+        :param tick_duration: (default 0.05) max delay before a pending batch is sent
+        :param logger: (optional) logging.Logger
+        :param require_success: (default True) if False, a failing call only fails its own future instead of the whole batch
+        :param method: (default 'aggregate') multicall3 method (see W3Multicall)
+        :param batch_max_bytes: (optional) max estimated calldata bytes per W3Multicall
+        :param batch_max_gas: (optional) max estimated gas per W3Multicall (see W3MulticallExecutor)
+        :param default_call_gas: (default 50000) initial gas estimate of an unknown signature
+        :param dedup: (default True) identical calls pending or in flight share the same slot
+        :param cache: (optional) W3MulticallCache. Cached calls are resolved at submission and removed from the batches
+        :param chain_id: (optional) chain identifier used in the cache keys
+        :param metrics: (optional) W3MulticallMetrics (see W3MulticallExecutor)
+        :param lane_lingers: (default {PRIORITY_HIGH: 0}) delay before a pending batch is sent per priority lane (other lanes use tick_duration)
+        """
+        super().__init__(multicall_contract_address, batch_max_size, tick_duration, logger, require_success, method, batch_max_bytes, batch_max_gas, default_call_gas, dedup, cache,
+                         chain_id, metrics, lane_lingers)
+        self.w3_pool = w3_pool
+        self.concurrency = concurrency
+        self.semaphore: Union[asyncio.Semaphore, None] = None
+        self.running: Set[asyncio.Future] = set()
+
+    def _new_task(self, block_identifier: Any, priority: int) -> 'AsyncW3MulticallExecutor.Task':
+        return AsyncW3MulticallExecutor.Task(block_identifier, priority)
+
+    def _trigger_pending_task(self, task: 'AsyncW3MulticallExecutor.Task'):
+        if task.flush_handle is not None:
+            task.flush_handle.cancel()
+            task.flush_handle = None
+        if self.pending_tasks.get(task.batch_key) is not task:
+            return
+        del self.pending_tasks[task.batch_key]
+        self.__start(task)
+
+    def __start(self, task: 'AsyncW3MulticallExecutor.Task'):
+        if self.logger is not None:
+            self.logger.debug("Triggering task {}".format(task))
+        self._observe_trigger(task, time.time())
+        running = asyncio.ensure_future(self.__execute(task))
+        self.running.add(running)
+        running.add_done_callback(self.running.discard)
+
+    async def __execute(self, task: 'AsyncW3MulticallExecutor.Task'):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        triggered_at = time.time()
+        async with self.semaphore:
+            if self.logger is not None:
+                self.logger.debug("Executing task {}".format(task))
+            if self.metrics is not None:
+                self.metrics.observe('executor_queue_wait_seconds', time.time() - triggered_at)
+                self.metrics.add('executor_inflight_tasks', 1)
+            try:
+                items = task.live_items(time.time())
+                live = set(k for k, _ in items)
+                self._release(task, [k for k in task.w3_calls if k not in live])
+                if self.metrics is not None and len(items) < len(task.w3_calls):
+                    self.metrics.inc('executor_dropped_calls_total', task.call_count if task.call_batch is not None else len(task.w3_calls) - len(items))
+                if task.call_batch is None:
+                    await self.__execute_calls(task, items)
+                elif items:
+                    await self.__execute_call_batch(task, 0, len(task.call_batch))
+            except Exception as e:
+                self._release(task)
+                for k in task.w3_futures:
+                    task.set_exception(k, e)
+            finally:
+                if task.call_batch is not None:
+                    results = task.call_batch_results.complete()
+                    if results is not None:
+                        task.set_result(0, results)
+                if self.metrics is not None:
+                    self.metrics.add('executor_inflight_tasks', -1)
+        self._release(task)
+        if self.logger is not None:
+            self.logger.debug("Task {} completed".format(task))
+
+    def __multicall(self, calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], block_identifier: Any):
+        async def multicall(w3: W3):
+            w3m = AsyncW3Multicall(w3.web3, self.multicall_contract_address, calls, require_success=self.require_success, method=self.method, cache=self.cache, chain_id=self.chain_id,
+                                   metrics=self.metrics)
+            return await w3m.call(lazy=True, block_identifier=block_identifier)
+        return multicall
+
+    async def __execute_calls(self, task: 'AsyncW3MulticallExecutor.Task', items: List[Tuple[int, W3Multicall.Call]]):
+        """
+        Execute the calls, splitting them according to the provider max batch size and bisecting them upon gas or size failure
+        """
+        while items:
+            w3 = await self.w3_pool.acquire()
+            live = set(k for k, _ in task.live_items(time.time()))  # cancelled or expired while waiting for a W3
+            self._release(task, [k for k, _ in items if k not in live])
+            items = [(k, call) for k, call in items if k in live]
+            if not items:
+                break
+            batch = items if w3.max_batch_size is None else items[:w3.max_batch_size]
+            items = items[len(batch):]
+            try:
+                start = time.time()
+                results = await self.w3_pool.run(self.__multicall([call for _, call in batch], task.block_identifier), w3, is_provider_error=_is_provider_error)
+                elapsed = time.time() - start
+                if self.logger is not None:
+                    self.logger.debug("Multicall executed in {}s".format(elapsed))
+            except Exception as e:
+                if self._batch_failed(w3, task, [call for _, call in batch], e, time.time() - start):
+                    half = len(batch) // 2
+                    await self.__execute_calls(task, batch[:half])
+                    await self.__execute_calls(task, batch[half:])
+                else:
+                    self._release(task, [k for k, _ in batch])
+                    for k, _ in batch:
+                        task.set_exception(k, e)
+                continue
+
+            failures = 0
+            self._release(task, [k for k, _ in batch])
+            for i, (k, call) in enumerate(batch):
+                if results.success(i):
+                    task.set_result(k, results[i])
+                else:
+                    failures += 1
+                    task.set_exception(k, Exception("Call {} failed".format(call)))
+            self._batch_succeeded(w3, task, [call for _, call in batch], elapsed, time.time() - start - elapsed)
+            if self.metrics is not None:
+                self.metrics.inc('executor_calls_total', len(batch) - failures, status='success')
+                self.metrics.inc('executor_calls_total', failures, status='failure')
+
+    async def __execute_call_batch(self, task: 'AsyncW3MulticallExecutor.Task', start: int, stop: int):
+        """
+        Execute the calls start to stop (excluded) of the CallBatch slice of a task (see __execute_calls)
+        """
+        future = task.w3_futures[0][0]
+        while start < stop and not future.done():
+            w3 = await self.w3_pool.acquire()
+            if not task.live_items(time.time()):  # cancelled or expired while waiting for a W3
+                break
+            end = stop if w3.max_batch_size is None else min(stop, start + w3.max_batch_size)
+            calls = task.call_batch.slice(start, end) if end - start < len(task.call_batch) else task.call_batch
+            try:
+                call_start = time.time()
+                results = await self.w3_pool.run(self.__multicall(calls, task.block_identifier), w3, is_provider_error=_is_provider_error)
+                elapsed = time.time() - call_start
+            except Exception as e:
+                if self._batch_failed(w3, task, calls, e, time.time() - call_start):
+                    half = (start + end) // 2
+                    await self.__execute_call_batch(task, start, half)
+                    await self.__execute_call_batch(task, half, end)
+                else:
+                    task.set_exception(0, e)
+                start = end
+                continue
+            task.call_batch_results.put(task.call_batch_offset + start, results)
+            self._batch_succeeded(w3, task, calls, elapsed, time.time() - call_start - elapsed)
+            if self.metrics is not None:
+                successes = sum(results.successes)
+                self.metrics.inc('executor_calls_total', successes, status='success')
+                self.metrics.inc('executor_calls_total', len(results) - successes, status='failure')
+            start = end
+
+    def submit(self, call: W3Multicall.Call, block_identifier: Any = None, priority: int = W3MulticallBatcher.PRIORITY_NORMAL, deadline: Union[float, None] = None) -> asyncio.Future:
+        """
+        Submit a W3Multicall.Call for execution
+        :param call: call to execute
+        :param block_identifier: (optional) block number, hash or tag of the call (default 'latest')
+        :param priority: (default PRIORITY_NORMAL) batching lane of the call (see W3MulticallExecutor.submit())
+        :param deadline: (optional) time.time() after which the call is not sent anymore (its Future raises asyncio.TimeoutError)
+        :return: asyncio.Future. Await it to get the result of the call. Cancelling it before the call is sent removes the call from the batch
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        cached = self._get_cached(call, block_identifier)
+        if cached is not None:
+            if cached[0]:
+                future.set_result(W3Multicall.LazyResults([call], None, [cached])[0])
+            else:
+                future.set_exception(Exception("Call {} failed".format(call)))
+            return future
+        dedup_key, slot = self._join_inflight(call, block_identifier, priority)
+        if slot is not None:
+            task, call_key = slot
+            task.w3_futures[call_key].append(future)
+            task.w3_deadlines[call_key].append(deadline)
+            return future
+        task, call_key = self._add_call(call, block_identifier, priority, deadline, dedup_key, future)
+        task.w3_deadlines[call_key] = [deadline]
+        linger = self.lane_lingers.get(priority, self.tick_duration)
+        if task.flush_handle is None:
+            task.flush_handle = loop.call_later(linger, self._trigger_pending_task, task)
+        if deadline is not None and deadline == task.call_deadline:  # earliest deadline of the task
+            task.flush_handle.cancel()  # leave the call a chance to be sent before its deadline
+            task.flush_handle = loop.call_later(max(0, min(task.creation_time + linger, deadline - linger) - time.time()), self._trigger_pending_task, task)
+        if self._is_full(task):
+            self._trigger_pending_task(task)
+        return future
+
+    def submit_batch(self, calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], block_identifier: Any = None, priority: int = W3MulticallBatcher.PRIORITY_NORMAL,
+                     deadline: Union[float, None] = None) -> Union[List[asyncio.Future], asyncio.Future]:
+        """
+        Submit several calls at once (see W3MulticallExecutor.submit_batch())
+        :param calls: list of W3Multicall.Call or W3Multicall.CallBatch
+        :param block_identifier: (optional) block number, hash or tag of the calls (default 'latest')
+        :param priority: (default PRIORITY_NORMAL) see submit()
+        :param deadline: (optional) see submit()
+        :return: asyncio.Future of each call, or a single asyncio.Future of the W3Multicall.LazyResults of the whole CallBatch
+        """
+        if not isinstance(calls, W3Multicall.CallBatch):
+            return [self.submit(call, block_identifier, priority, deadline) for call in calls]
+        future = asyncio.get_running_loop().create_future()
+        tasks = self._call_batch_tasks(calls, block_identifier, priority, deadline)
+        if not tasks:
+            future.set_result(W3Multicall.LazyResults(calls, None, []))
+        for task in tasks:
+            task.w3_futures[0] = [future]
+            task.w3_deadlines[0] = [deadline]
+            self.__start(task)
+        return future
+
+    def cancel_pending(self):
+        for task in self.pending_tasks.values():
+            if task.flush_handle is not None:
+                task.flush_handle.cancel()
+                task.flush_handle = None
+            for futures in task.w3_futures.values():
+                for future in futures:
+                    future.cancel()
+            self._release(task)
+        self.pending_tasks = {}
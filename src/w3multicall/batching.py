@@ -0,0 +1,361 @@
+from typing import List, Dict, Union, Tuple, Any, Hashable, Optional
+import abc
+import datetime
+import logging
+import threading
+import time
+
+import requests
+from web3.exceptions import ContractLogicError
+
+from .multicall import W3Multicall, _padded_length
+from .cache import W3MulticallCache
+from .metrics import W3MulticallMetrics, RATIO_BUCKETS, SIZE_BUCKETS
+from .w3.w3 import W3
+
+OUT_OF_GAS_ERRORS = ('out of gas', 'gas required exceeds', 'exceeds block gas limit', 'gas limit reached', 'intrinsic gas too')
+PAYLOAD_TOO_LARGE_ERRORS = ('payload too large', 'request entity too large', 'request too large', 'response too large', 'response is too big', 'response size', 'size limit',
+                            'size exceeded', 'exceeds the size limit')
+PAYLOAD_TOO_LARGE_STATUS = 413
+REVERT_ERRORS = ('execution reverted', 'vm execution error', 'invalid opcode')
+REVERT_CODE = 3
+
+
+def _is_out_of_gas_error(e: Exception) -> bool:
+    message = str(e).lower()
+    return any(error in message for error in OUT_OF_GAS_ERRORS)
+
+
+def _is_payload_too_large_error(e: Exception) -> bool:
+    if isinstance(e, ContractLogicError):
+        return False  # revert (reason or custom error data), not a provider limit
+    response = getattr(e, 'response', None)
+    if getattr(response, 'status_code', None) == PAYLOAD_TOO_LARGE_STATUS:
+        return True
+    message = str(e).lower()
+    return any(error in message for error in PAYLOAD_TOO_LARGE_ERRORS)
+
+
+def _is_batch_limit_error(e: Exception) -> bool:
+    """
+    :return: True if the batch is too large for the provider (smaller batches may succeed)
+    """
+    return _is_out_of_gas_error(e) or _is_payload_too_large_error(e)
+
+
+def _is_revert_error(e: Exception) -> bool:
+    if isinstance(e, ContractLogicError):
+        return True
+    code = getattr(e, 'code', None)
+    if code is None and e.args and isinstance(e.args[0], dict):
+        code = e.args[0].get('code')  # web3 ValueError holding the JSON-RPC error
+    if code == REVERT_CODE:
+        return True
+    message = str(e).lower()
+    return any(error in message for error in REVERT_ERRORS)
+
+
+def _is_provider_error(e: Exception) -> bool:
+    """
+    :return: True if e counts against the provider health (not a revert, nor a gas or size limit of the batch)
+    """
+    return not _is_revert_error(e) and not _is_batch_limit_error(e)
+
+
+def _is_transport_error(e: Exception) -> bool:
+    """
+    :return: True if the provider did not answer (connection, timeout or HTTP status error), as opposed to a JSON-RPC error answered to the request
+    """
+    return isinstance(e, (requests.exceptions.RequestException, OSError, TimeoutError))
+
+
+def _block_key(block_identifier: Any) -> Hashable:
+    return 'latest' if block_identifier is None else block_identifier
+
+
+def _dedup_key(multicall_address: str, call: W3Multicall.Call, block_identifier: Any = None) -> tuple:
+    return multicall_address.lower(), call.address.lower(), call.data, call.signature, call.allow_failure, _block_key(block_identifier)
+
+
+def _estimate_call_size(call: W3Multicall.Call) -> int:
+    return 128 + _padded_length(len(call.data))  # element offset + address + bytes offset + bytes length + padded bytes
+
+
+def _signatures(calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch]) -> set:
+    if isinstance(calls, W3Multicall.CallBatch):
+        return {calls.template.signature}
+    return set(call.signature for call in calls)
+
+
+class W3MulticallBatcher(abc.ABC):
+    """
+    Batching, adaptive batch sizing, cache and deduplication logic shared by W3MulticallExecutor and AsyncW3MulticallExecutor
+    """
+
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 1
+    PRIORITY_LOW = 2
+
+    class Task:
+        def __init__(self, block_identifier: Any = None, priority: int = 1):
+            self.block_identifier = block_identifier
+            self.priority = priority
+            self.batch_key = (_block_key(block_identifier), priority)
+            self.creation_time = time.time()
+            self.w3_calls: Dict[int, W3Multicall.Call] = {}
+            self.w3_futures: Dict[int, List[Any]] = {}
+            self.dedup_keys: Dict[int, tuple] = {}
+            self.call_deadline: Union[float, None] = None
+            self.size_estimate = 0
+            self.gas_estimate = 0
+            self.call_batch: Optional[W3Multicall.CallBatch] = None  # slice of a submitted CallBatch, stored as the single call key 0
+            self.call_batch_offset = 0
+            self.call_batch_results: Optional[W3MulticallBatcher.CallBatchResults] = None
+
+        def __repr__(self):
+            return "{}|{}".format(datetime.datetime.fromtimestamp(self.creation_time), self.call_count)
+
+        @property
+        def call_count(self) -> int:
+            return len(self.w3_calls) if self.call_batch is None else len(self.call_batch)
+
+    class CallBatchResults:
+        """
+        Results of a W3Multicall.CallBatch executed as several tasks, gathered into a single W3Multicall.LazyResults
+        """
+
+        def __init__(self, call_batch: W3Multicall.CallBatch, slices: int):
+            self.call_batch = call_batch
+            self.remaining = slices
+            self.return_data: List[Any] = [b''] * len(call_batch)
+            self.successes: List[bool] = [False] * len(call_batch)
+            self.block_numbers = set()
+            self.lock = threading.Lock()
+
+        def put(self, offset: int, results: W3Multicall.LazyResults):
+            """
+            :param offset: index in the CallBatch of the first call of results
+            :param results: results of consecutive calls of the CallBatch
+            """
+            end = offset + len(results)
+            self.return_data[offset:end] = results.return_data
+            self.successes[offset:end] = results.successes
+            self.block_numbers.add(results.block_number)
+
+        def complete(self) -> Union[W3Multicall.LazyResults, None]:
+            """
+            Count a resolved slice
+            :return: results of the whole CallBatch once every slice is resolved (None before)
+            """
+            with self.lock:
+                self.remaining -= 1
+                if self.remaining > 0:
+                    return None
+            block_number = next(iter(self.block_numbers)) if len(self.block_numbers) == 1 else None  # 'latest' slices may run at different blocks
+            return W3Multicall.LazyResults(self.call_batch, block_number, list(zip(self.successes, self.return_data)))
+
+    def __init__(self, multicall_contract_address: str, batch_max_size: int, tick_duration: float, logger: Union[logging.Logger, None], require_success: bool, method: str,
+                 batch_max_bytes: Union[int, None], batch_max_gas: Union[int, None], default_call_gas: int, dedup: bool, cache: Optional[W3MulticallCache], chain_id: Any,
+                 metrics: Optional[W3MulticallMetrics], lane_lingers: Optional[Dict[int, float]]):
+        """
+        See W3MulticallExecutor
+        """
+        self.multicall_contract_address = multicall_contract_address
+        self.batch_max_size = batch_max_size
+        self.tick_duration = tick_duration
+        self.logger = logger
+        self.require_success = require_success
+        self.method = method
+        self.batch_max_bytes = batch_max_bytes
+        self.batch_max_gas = batch_max_gas
+        self.default_call_gas = default_call_gas
+        self.gas_estimates: Dict[str, float] = {}
+        self.dedup = dedup
+        self.inflight: Dict[tuple, Tuple[W3MulticallBatcher.Task, int]] = {}
+        self.cache = cache
+        self.chain_id = chain_id
+        self.metrics = metrics
+        self.lane_lingers = {W3MulticallBatcher.PRIORITY_HIGH: 0} if lane_lingers is None else lane_lingers
+        self.pending_tasks: Dict[Hashable, W3MulticallBatcher.Task] = {}
+        self.lock = threading.RLock()
+
+    @property
+    def pending_task(self) -> Union['W3MulticallBatcher.Task', None]:
+        """
+        Pending task of 'latest' calls of normal priority
+        """
+        return self.pending_tasks.get((_block_key(None), W3MulticallBatcher.PRIORITY_NORMAL))
+
+    @abc.abstractmethod
+    def _trigger_pending_task(self, task: 'W3MulticallBatcher.Task'):
+        """
+        Remove task from the pending tasks and schedule its execution
+        """
+
+    @abc.abstractmethod
+    def _new_task(self, block_identifier: Any, priority: int) -> 'W3MulticallBatcher.Task':
+        """
+        :return: empty Task of the executor
+        """
+
+    def _is_full(self, task: 'W3MulticallBatcher.Task') -> bool:
+        if len(task.w3_calls) >= self.batch_max_size:
+            return True
+        if self.batch_max_bytes is not None and task.size_estimate >= self.batch_max_bytes:
+            return True
+        return self.batch_max_gas is not None and task.gas_estimate >= self.batch_max_gas
+
+    def _would_overflow(self, task: 'W3MulticallBatcher.Task', call_size: int, call_gas: float) -> bool:
+        if self.batch_max_bytes is not None and task.size_estimate + call_size > self.batch_max_bytes:
+            return True
+        return self.batch_max_gas is not None and task.gas_estimate + call_gas > self.batch_max_gas
+
+    def _estimate_call_gas(self, signature: str) -> float:
+        return self.gas_estimates.get(signature, self.default_call_gas)
+
+    def _learn_success(self, w3: W3, calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch]):
+        with self.lock:
+            if w3.max_batch_size is not None and len(calls) >= w3.max_batch_size:
+                w3.max_batch_size += 1  # additive increase to probe the provider limit again
+            if self.batch_max_gas is not None:
+                for signature in _signatures(calls):
+                    self.gas_estimates[signature] = max(self._estimate_call_gas(signature) * 0.95, 100)
+
+    def _learn_failure(self, w3: W3, calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], out_of_gas: bool):
+        with self.lock:
+            max_batch_size = max(1, len(calls) // 2)
+            w3.max_batch_size = max_batch_size if w3.max_batch_size is None else min(w3.max_batch_size, max_batch_size)
+            if out_of_gas and self.batch_max_gas is not None:
+                for signature in _signatures(calls):
+                    self.gas_estimates[signature] = min(self._estimate_call_gas(signature) * 2, self.batch_max_gas)
+            if self.logger is not None:
+                self.logger.warning("Batch of {} calls too large for {}. Max batch size lowered to {}".format(len(calls), w3, w3.max_batch_size))
+
+    def _get_cached(self, call: W3Multicall.Call, block_identifier: Any) -> Optional[Tuple[bool, bytes]]:
+        if self.cache is None:
+            return None
+        block, _ = self.cache.resolve_block(block_identifier)
+        return None if block is None else self.cache.get(self.chain_id, block, self.multicall_contract_address, call)
+
+    def _join_inflight(self, call: W3Multicall.Call, block_identifier: Any, priority: int) -> Tuple[Union[tuple, None], Union[Tuple['W3MulticallBatcher.Task', int], None]]:
+        """
+        :return: dedup key of the call (None if dedup is disabled) and (task, call key) of the identical call to share, if any.
+                 A lower priority task still pending is not shared so that the call is not delayed by its lane
+        """
+        if not self.dedup:
+            return None, None
+        dedup_key = _dedup_key(self.multicall_contract_address, call, block_identifier)
+        slot = self.inflight.get(dedup_key)
+        if slot is not None and slot[0].priority > priority and self.pending_tasks.get(slot[0].batch_key) is slot[0]:
+            slot = None
+        return dedup_key, slot
+
+    def _add_call(self, call: W3Multicall.Call, block_identifier: Any, priority: int, deadline: Union[float, None], dedup_key: Union[tuple, None],
+                  future: Any) -> Tuple['W3MulticallBatcher.Task', int]:
+        """
+        Add a call to the pending task of its block and priority lane, triggering the pending task first if the call would overflow it
+        :return: task and call key
+        """
+        call_size = _estimate_call_size(call)
+        call_gas = self._estimate_call_gas(call.signature)
+        batch_key = (_block_key(block_identifier), priority)
+        task = self.pending_tasks.get(batch_key)
+        if task is not None and self._would_overflow(task, call_size, call_gas):
+            self._trigger_pending_task(task)
+            task = None
+        if task is None:
+            task = self._new_task(block_identifier, priority)
+            self.pending_tasks[batch_key] = task
+            if self.metrics is not None:
+                self.metrics.set('executor_pending_tasks', len(self.pending_tasks))
+        call_key = len(task.w3_calls)
+        task.w3_calls[call_key] = call
+        task.w3_futures[call_key] = [future]
+        task.size_estimate += call_size
+        task.gas_estimate += call_gas
+        if deadline is not None:
+            task.call_deadline = deadline if task.call_deadline is None else min(task.call_deadline, deadline)
+        if dedup_key is not None:
+            task.dedup_keys[call_key] = dedup_key
+            self.inflight[dedup_key] = (task, call_key)
+        return task, call_key
+
+    def _call_batch_tasks(self, call_batch: W3Multicall.CallBatch, block_identifier: Any, priority: int, deadline: Union[float, None]) -> List['W3MulticallBatcher.Task']:
+        """
+        Split a CallBatch into tasks holding contiguous slices of it, within batch_max_size, batch_max_bytes and batch_max_gas. The calls of a CallBatch are neither
+        deduplicated nor looked up in the cache at submission (W3Multicall still serves the cached ones)
+        :return: tasks to trigger (sharing the same CallBatchResults)
+        """
+        count = len(call_batch)
+        call_gas = self._estimate_call_gas(call_batch.template.signature)
+        max_rows = self.batch_max_size
+        if self.batch_max_gas is not None:
+            max_rows = max(1, min(max_rows, int(self.batch_max_gas // call_gas)))
+        offsets = call_batch.offsets
+        ranges = []
+        start = 0
+        while start < count:
+            stop = min(count, start + max_rows)
+            if self.batch_max_bytes is not None:
+                size = 0
+                for i in range(start, stop):
+                    size += 128 + _padded_length(offsets[i + 1] - offsets[i])
+                    if size > self.batch_max_bytes and i > start:
+                        stop = i
+                        break
+            ranges.append((start, stop))
+            start = stop
+        results = W3MulticallBatcher.CallBatchResults(call_batch, len(ranges))
+        tasks = []
+        for start, stop in ranges:
+            task = self._new_task(block_identifier, priority)
+            task.call_batch = call_batch.slice(start, stop)
+            task.call_batch_offset = start
+            task.call_batch_results = results
+            task.w3_calls[0] = task.call_batch
+            task.call_deadline = deadline
+            task.gas_estimate = call_gas * (stop - start)
+            tasks.append(task)
+        return tasks
+
+    def _release(self, task: 'W3MulticallBatcher.Task', call_keys: Optional[List[int]] = None):
+        """
+        Stop sharing the slots of a task. A slot must be released before its Futures are resolved so that a later duplicate is not joined to it
+        :param call_keys: (default all) slots resolved or dropped
+        """
+        with self.lock:
+            for call_key in task.dedup_keys if call_keys is None else call_keys:
+                dedup_key = task.dedup_keys.get(call_key)
+                if dedup_key is not None and self.inflight.get(dedup_key) == (task, call_key):
+                    del self.inflight[dedup_key]
+
+    def _observe_trigger(self, task: 'W3MulticallBatcher.Task', trigger_time: float):
+        if self.metrics is None:
+            return
+        self.metrics.observe('executor_linger_seconds', trigger_time - task.creation_time)
+        self.metrics.observe('executor_batch_calls', task.call_count, SIZE_BUCKETS)
+        self.metrics.observe('executor_batch_fill_ratio', task.call_count / self.batch_max_size, RATIO_BUCKETS)
+        self.metrics.set('executor_pending_tasks', len(self.pending_tasks))
+
+    def _batch_failed(self, w3: W3, task: 'W3MulticallBatcher.Task', calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], e: Exception, duration: float) -> bool:
+        """
+        Record a failed multicall and learn the provider limits
+        :return: True if the batch must be bisected and retried
+        """
+        out_of_gas = _is_out_of_gas_error(e)
+        retry = len(calls) > 1 and (out_of_gas or _is_payload_too_large_error(e))
+        if self.metrics is not None:
+            self.metrics.inc('executor_batches_total', provider=w3.label, status='error')
+            if retry:
+                self.metrics.inc('executor_retries_total', provider=w3.label, reason='out_of_gas' if out_of_gas else 'payload_too_large')
+            self.metrics.emit('batch', provider=w3.label, calls=len(calls), block_identifier=task.block_identifier, duration=duration, exception=e, retry=retry)
+        if retry:
+            self._learn_failure(w3, calls, out_of_gas)
+        return retry
+
+    def _batch_succeeded(self, w3: W3, task: 'W3MulticallBatcher.Task', calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], duration: float, decode_duration: float):
+        self._learn_success(w3, calls)
+        if self.metrics is not None:
+            self.metrics.inc('executor_batches_total', provider=w3.label, status='success')
+            self.metrics.observe('executor_decode_seconds', decode_duration)
+            self.metrics.emit('batch', provider=w3.label, calls=len(calls), block_identifier=task.block_identifier, duration=duration, exception=None, retry=False)
@@ -0,0 +1,100 @@
+from typing import Tuple, Union, Optional, Any, Hashable
+from collections import OrderedDict
+import threading
+import time
+
+MOVING_BLOCK_TAGS = ('latest', 'pending', 'safe', 'finalized')
+
+
+class W3MulticallCache:
+    """
+    Thread safe LRU cache of raw call results pinned to a block. Keyed by (chain, block, multicall address, target, calldata)
+    """
+
+    def __init__(self, max_entries: int = 100000, max_bytes: Union[int, None] = None, head_ttl: Union[float, None] = 1.0):
+        """
+        :param max_entries: (default 100000) max number of cached results
+        :param max_bytes: (optional) max total size of the cached return data
+        :param head_ttl: (default 1.0) seconds during which the last seen head serves 'latest' calls without a new head being seen. None to wait for W3MulticallCache.set_head()
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.head_ttl = head_ttl
+        self.entries: 'OrderedDict[tuple, Tuple[bool, bytes]]' = OrderedDict()
+        self.size = 0
+        self.head: Union[int, None] = None
+        self.head_seen_at = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "W3MulticallCache({} entries, {} bytes, head={})".format(len(self.entries), self.size, self.head)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def set_head(self, block_number: int):
+        """
+        Record the current head. 'latest' results are cached under the head block number
+        :param block_number: head block number
+        """
+        with self.lock:
+            if self.head is None or block_number >= self.head:
+                self.head = block_number
+                self.head_seen_at = time.time()
+
+    def resolve_block(self, block_identifier: Any) -> Tuple[Optional[Hashable], bool]:
+        """
+        :param block_identifier: block identifier of the eth_call (None for 'latest')
+        :return: block key of the cached results (None if results cannot be served from the cache) and True if block_identifier is 'latest'
+        """
+        if block_identifier is None or block_identifier == 'latest':
+            with self.lock:
+                fresh = self.head is not None and (self.head_ttl is None or time.time() - self.head_seen_at <= self.head_ttl)
+                return (self.head if fresh else None), True
+        if isinstance(block_identifier, int):
+            return block_identifier, False
+        if block_identifier == 'earliest':
+            return 0, False
+        if block_identifier in MOVING_BLOCK_TAGS:
+            return None, False
+        if isinstance(block_identifier, (bytes, bytearray)):
+            return ('hash', bytes(block_identifier).hex()), False
+        if isinstance(block_identifier, str) and block_identifier[:2] in ('0x', '0X'):
+            if len(block_identifier) == 66:
+                return ('hash', block_identifier[2:].lower()), False
+            return int(block_identifier, 16), False
+        return None, False
+
+    def get(self, chain_id: Any, block: Hashable, multicall_address: str, call) -> Optional[Tuple[bool, bytes]]:
+        """
+        :return: (success, return data) of the call or None if not cached
+        """
+        key = (chain_id, block, multicall_address.lower(), call.address.lower(), call.data)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, chain_id: Any, block: Hashable, multicall_address: str, call, success: bool, output: bytes):
+        key = (chain_id, block, multicall_address.lower(), call.address.lower(), call.data)
+        output = bytes(output)
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self.entries[key] = (success, output)
+            self.size += len(output)
+            while self.entries and (len(self.entries) > self.max_entries or (self.max_bytes is not None and self.size > self.max_bytes)):
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
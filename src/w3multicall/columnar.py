@@ -0,0 +1,132 @@
+from typing import List, Sequence, Optional, Tuple
+import re
+
+from eth_typing.abi import Decodable, TypeStr
+
+BIG_INT_LIMBS = 'limbs'
+BIG_INT_OBJECT = 'object'
+BIG_INT_FLOAT = 'float'
+
+_INTEGER_TYPE = re.compile(r'^(u?)int(\d*)$')
+_FIXED_BYTES_TYPE = re.compile(r'^bytes(\d+)$')
+
+
+def _column_kind(output_type: TypeStr) -> Tuple[str, int]:
+    """
+    :return: kind ('uint', 'int', 'bool', 'address' or 'bytes') and size in bits (bytes for 'bytes') of a static output type
+    """
+    match = _INTEGER_TYPE.match(output_type)
+    if match is not None:
+        return 'uint' if match.group(1) else 'int', int(match.group(2) or 256)
+    if output_type == 'bool':
+        return 'bool', 8
+    if output_type == 'address':
+        return 'address', 160
+    match = _FIXED_BYTES_TYPE.match(output_type)
+    if match is not None:
+        return 'bytes', int(match.group(1))
+    raise Exception("Columnar decoding requires static output types (got '{}')".format(output_type))
+
+
+def _numpy():
+    """
+    Import numpy on first use so that importing w3multicall does not pay for it (optional dependency)
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise Exception("Columnar decoding requires numpy (pip install numpy)")
+    return numpy
+
+
+def _integer_column(words: 'np.ndarray', kind: str, bits: int, big_int: str) -> 'np.ndarray':
+    """
+    :param words: (n, 32) uint8 array of big endian ABI words
+    """
+    np = _numpy()
+    if bits <= 64:
+        low = np.ascontiguousarray(words[:, 24:]).view('>i8' if kind == 'int' else '>u8').ravel()
+        dtype = next('{}{}'.format(kind, size) for size in (8, 16, 32, 64) if bits <= size)
+        return low.astype(dtype)
+    limbs = (bits + 63) // 64
+    limb_words = np.ascontiguousarray(words[:, 32 - 8 * limbs:]).view('>u8').reshape(len(words), limbs).astype(np.uint64)  # most significant limb first
+    if big_int == BIG_INT_LIMBS:
+        return limb_words
+    if big_int == BIG_INT_FLOAT:
+        negative = (words[:, 0] >= 0x80) if kind == 'int' else np.zeros(len(words), dtype=bool)
+        magnitudes = np.where(negative[:, None], ~limb_words, limb_words)  # two's complement: -x = ~x + 1
+        values = np.zeros(len(words), dtype=np.float64)
+        for limb in range(limbs):
+            values = values * 18446744073709551616.0 + magnitudes[:, limb]
+        return np.where(negative, -(values + 1), values)
+    if big_int == BIG_INT_OBJECT:
+        raw = np.ascontiguousarray(words).tobytes()
+        values = np.empty(len(words), dtype=object)
+        values[:] = [int.from_bytes(raw[i:i + 32], 'big', signed=kind == 'int') for i in range(0, len(raw), 32)]
+        return values
+    raise Exception("Unknown big_int mode '{}'".format(big_int))
+
+
+class W3MulticallColumns(Sequence):
+    """
+    Results of calls sharing the same static output types, one NumPy array per output field
+    """
+
+    def __init__(self, output_types: List[TypeStr], columns: List['np.ndarray'], success: 'np.ndarray', block_number: Optional[int] = None):
+        self.output_types = output_types
+        self.columns = columns
+        self.success = success
+        self.block_number = block_number
+
+    def __repr__(self):
+        return "W3MulticallColumns({}, size={}, failed={})".format(','.join(self.output_types), len(self.success), int((~self.success).sum()))
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __getitem__(self, index):
+        return self.columns[index]
+
+
+def decode_columns(output_types: List[TypeStr], return_data: Sequence[Decodable], successes: Optional[Sequence[bool]] = None, big_int: str = BIG_INT_LIMBS,
+                   block_number: Optional[int] = None) -> W3MulticallColumns:
+    """
+    Decode the return data of calls sharing the same static output types into one NumPy array per field. Return data are copied once into a
+    contiguous (calls, fields, 32) buffer and each field is a vectorized view of it. Failed calls (or return data too short) are zeroed and flagged False in the success mask
+    Column dtypes:
+    - uint<=64 / int<=64: smallest fitting NumPy integer
+    - wider integers: (calls, limbs) uint64 big endian limbs (big_int='limbs'), Python int object array (big_int='object') or float64 approximation (big_int='float')
+    - bool: bool
+    - address: (calls, 20) uint8
+    - bytes<N>: (calls, N) uint8
+    :param output_types: output types shared by all the calls (Example: ['uint112', 'uint112', 'uint32'])
+    :param return_data: raw return data of each call
+    :param successes: (optional) success of each call
+    :param big_int: (default 'limbs') representation of integers wider than 64 bits: 'limbs', 'object' or 'float'
+    :param block_number: (optional) block number of the results
+    :return: W3MulticallColumns
+    """
+    np = _numpy()
+    kinds = [_column_kind(output_type) for output_type in output_types]
+    width = 32 * len(output_types)
+    zero = bytes(width)
+    if successes is None:
+        ok = [len(output) >= width for output in return_data]
+    else:
+        ok = [success and len(output) >= width for output, success in zip(return_data, successes)]
+    buffer = b''.join([(output if len(output) == width else output[:width]) if k else zero for output, k in zip(return_data, ok)])
+    success = np.array(ok, dtype=bool)
+    words = np.frombuffer(buffer, dtype=np.uint8).reshape(len(return_data), len(output_types), 32)
+
+    columns = []
+    for j, (kind, bits) in enumerate(kinds):
+        field = words[:, j, :]
+        if kind == 'bool':
+            columns.append(field[:, 31] != 0)
+        elif kind == 'address':
+            columns.append(np.ascontiguousarray(field[:, 12:]))
+        elif kind == 'bytes':
+            columns.append(np.ascontiguousarray(field[:, :bits]))
+        else:
+            columns.append(_integer_column(field, kind, bits, big_int))
+    return W3MulticallColumns(list(output_types), columns, success, block_number)
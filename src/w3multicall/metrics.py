@@ -0,0 +1,195 @@
+from typing import List, Dict, Tuple, Union, Callable, Any, Optional, Sequence
+import bisect
+import logging
+import threading
+import http.server
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> MetricKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_key(key: MetricKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    name, labels = key
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return name
+    return '{}{{{}}}'.format(name, ','.join('{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels))
+
+
+class W3MulticallHistogram:
+    """
+    Cumulative histogram with fixed upper bounds
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Union[float, None]:
+        """
+        :return: upper bound of the bucket holding the q quantile (None if empty, inf if above the last bucket)
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets, 'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99)}
+
+
+class W3MulticallMetrics:
+    """
+    Thread safe in-process metrics (counters, gauges and histograms) and event hooks shared by W3MulticallExecutor and W3Pool
+    """
+
+    def __init__(self, hooks: Optional[List[Callable[[str, dict], None]]] = None, prefix: str = 'w3multicall', logger: Union[logging.Logger, None] = None):
+        """
+        :param hooks: (optional) callbacks called with (event name, fields) (see README for the events)
+        :param prefix: (default 'w3multicall') prefix of the exported metric names
+        :param logger: (optional) logging.Logger reporting failing hooks
+        """
+        self.hooks = [] if hooks is None else list(hooks)
+        self.prefix = prefix
+        self.logger = logger
+        self.counters: Dict[MetricKey, float] = {}
+        self.gauges: Dict[MetricKey, float] = {}
+        self.histograms: Dict[MetricKey, W3MulticallHistogram] = {}
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return "W3MulticallMetrics({} counters, {} gauges, {} histograms)".format(len(self.counters), len(self.gauges), len(self.histograms))
+
+    def add_hook(self, hook: Callable[[str, dict], None]):
+        self.hooks.append(hook)
+
+    def emit(self, event: str, **fields):
+        """
+        Call the hooks with an event. A failing hook is logged and does not interrupt the caller
+        """
+        for hook in self.hooks:
+            try:
+                hook(event, fields)
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.warning("Metrics hook {} failed on {}: {}".format(hook, event, e))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _metric_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges[_metric_key(name, labels)] = value
+
+    def add(self, name: str, value: float, **labels):
+        key = _metric_key(name, labels)
+        with self.lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels):
+        """
+        :param buckets: (default LATENCY_BUCKETS) upper bounds, used when the histogram is created
+        """
+        key = _metric_key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = W3MulticallHistogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """
+        :return: {'counters': {key: value}, 'gauges': {key: value}, 'histograms': {key: {count, sum, buckets, p50, p90, p99}}} with Prometheus style keys
+        """
+        with self.lock:
+            return {
+                'counters': {_format_key(key): value for key, value in self.counters.items()},
+                'gauges': {_format_key(key): value for key, value in self.gauges.items()},
+                'histograms': {_format_key(key): histogram.snapshot() for key, histogram in self.histograms.items()},
+            }
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def to_prometheus(self) -> str:
+        """
+        :return: metrics in the Prometheus text exposition format
+        """
+        lines = []
+        typed = set()
+
+        def declare(name: str, metric_type: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                name = '{}_{}'.format(self.prefix, name)
+                declare(name, 'counter')
+                lines.append('{} {}'.format(_format_key((name, labels)), value))
+            for (name, labels), value in sorted(self.gauges.items()):
+                name = '{}_{}'.format(self.prefix, name)
+                declare(name, 'gauge')
+                lines.append('{} {}'.format(_format_key((name, labels)), value))
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                name = '{}_{}'.format(self.prefix, name)
+                declare(name, 'histogram')
+                for bound, cumulative in histogram.snapshot()['buckets'].items():
+                    lines.append('{} {}'.format(_format_key((name + '_bucket', labels), (('le', '+Inf' if bound == float('inf') else repr(float(bound))),)), cumulative))
+                lines.append('{} {}'.format(_format_key((name + '_sum', labels)), histogram.sum))
+                lines.append('{} {}'.format(_format_key((name + '_count', labels)), histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def serve_prometheus(self, port: int, host: str = '0.0.0.0') -> http.server.ThreadingHTTPServer:
+        """
+        Serve W3MulticallMetrics.to_prometheus() over HTTP in a daemon thread
+        :return: HTTP server (call shutdown() to stop)
+        """
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='W3MulticallMetrics-exporter', daemon=True).start()
+        return server
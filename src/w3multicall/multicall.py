@@ -1,8 +1,16 @@
-from typing import Tuple, List, Union, Optional, Any, Iterable, Callable
+from typing import Tuple, List, Union, Optional, Any, Iterable, Callable, Sequence
+from array import array
+import functools
+import re
+import time
 
 import eth_utils
 from eth_typing.abi import Decodable, TypeStr
 
+from .cache import W3MulticallCache
+from .metrics import W3MulticallMetrics, SIZE_BUCKETS
+from .columnar import W3MulticallColumns, decode_columns, BIG_INT_LIMBS
+
 # For eth_abi versions < 2.2.0, `decode` and `encode` have not yet been added.
 # As we require web3 ^5.27, we require eth_abi compatibility with eth_abi v2.0.0b6 and greater.
 try:
@@ -10,6 +18,13 @@ try:
 except ImportError:
     from eth_abi import encode_abi as encode, decode_abi as decode
 
+try:
+    from eth_abi.registry import registry as _abi_registry
+    from eth_abi.decoding import ContextFramesBytesIO as _AbiStream
+except ImportError:
+    _abi_registry = None
+    _AbiStream = None
+
 
 def _parse_signature(signature: str) -> Tuple[str, List[TypeStr], List[TypeStr]]:
     """
@@ -63,6 +78,93 @@ def _decode_data(output_types: List[TypeStr], output: Decodable) -> Any:
     return decode(output_types, output)
 
 
+def _compile_encoder(input_types: List[TypeStr]) -> Callable[[Any], bytes]:
+    """
+    Resolve once the tuple encoder for input_types (falls back on the generic eth_abi encode)
+    """
+    if _abi_registry is not None:
+        try:
+            return _abi_registry.get_encoder('({})'.format(','.join(input_types)))
+        except Exception:
+            pass
+    return functools.partial(encode, input_types)
+
+
+def _compile_decoder(output_types: List[TypeStr]) -> Callable[[Decodable], Any]:
+    """
+    Resolve once the tuple decoder for output_types (falls back on the generic eth_abi decode)
+    """
+    if _abi_registry is not None and _AbiStream is not None:
+        try:
+            tuple_decoder = _abi_registry.get_decoder('({})'.format(','.join(output_types)))
+            return lambda output: tuple_decoder(_AbiStream(output))
+        except Exception:
+            pass
+    return lambda output: decode(output_types, bytes(output))
+
+
+_STATIC_WORD_TYPE = re.compile(r'^(address|bool|uint\d+|int\d+|bytes32)$')
+
+
+def _check_address_checksum(value: Any) -> None:
+    """
+    Mixed-case hex addresses must carry a valid EIP-55 checksum (all lower or all upper case addresses are not checksummed)
+    """
+    if isinstance(value, str):
+        digits = value[2:] if value[:2] in ('0x', '0X') else value
+        if digits != digits.lower() and digits != digits.upper() and not eth_utils.is_checksum_address('0x' + digits):
+            raise Exception("Invalid address checksum {}".format(value))
+
+
+def _address_word_encoder(validate: Callable[[Any], None]) -> Callable[[Any], bytes]:
+    def encode_word(value):
+        _check_address_checksum(value)
+        validate(value)
+        return b'\x00' * 12 + _address_to_bytes(value)
+    return encode_word
+
+
+def _bytes32_word_encoder(validate: Callable[[Any], None]) -> Callable[[Any], bytes]:
+    def encode_word(value):
+        validate(value)
+        return bytes(value).ljust(32, b'\x00')
+    return encode_word
+
+
+def _int_word_encoder(validate: Callable[[Any], None], signed: bool) -> Callable[[Any], bytes]:
+    def encode_word(value):
+        validate(value)
+        return value.to_bytes(32, 'big', signed=signed)
+    return encode_word
+
+
+def _static_word_encoders(input_types: List[TypeStr]) -> Optional[List[Callable[[Any], bytes]]]:
+    """
+    :return: one 32 bytes word encoder per input if all the input types are address, bool, (u)int or bytes32 (None otherwise)
+    Values go through the validation of the eth_abi encoder of their type (bit width bounds, strict bool, bytes size) so invalid args raise the same errors as W3Multicall.Call
+    """
+    if _abi_registry is None or not input_types or not all(_STATIC_WORD_TYPE.match(input_type) for input_type in input_types):
+        return None
+    try:
+        validators = [_abi_registry.get_encoder(input_type).validate_value for input_type in input_types]
+    except Exception:
+        return None
+    encoders = []
+    for input_type, validate in zip(input_types, validators):
+        if input_type == 'address':
+            encoders.append(_address_word_encoder(validate))
+        elif input_type == 'bytes32':
+            encoders.append(_bytes32_word_encoder(validate))
+        else:
+            encoders.append(_int_word_encoder(validate, signed=input_type.startswith('int')))
+    return encoders
+
+
+@functools.lru_cache(maxsize=4096)
+def _get_call_template(signature: str) -> 'W3Multicall.CallTemplate':
+    return W3Multicall.CallTemplate(signature)
+
+
 def get_args(calls, require_success) -> List[Union[bool, List[List[Any]]]]:
     if require_success is True:
         return [[[call.address, call.data] for call in calls]]
@@ -73,7 +175,8 @@ def _decode_output(
         output: Decodable,
         output_types: List[TypeStr],
         returns: Optional[Iterable[Tuple[str, Callable]]] = None,
-        success: Optional[bool] = None
+        success: Optional[bool] = None,
+        decoder: Optional[Callable[[Decodable], Any]] = None
 ) -> Any:
     if success is None:
         apply_handler = lambda handler, value: handler(value)
@@ -82,7 +185,7 @@ def _decode_output(
 
     if success is None or success:
         try:
-            decoded = _decode_data(output_types, output)
+            decoded = decoder(output) if decoder is not None else _decode_data(output_types, output)
         except:
             success, decoded = False, [None] * (1 if not returns else len(returns))  # type: ignore
     else:
@@ -102,6 +205,126 @@ def _unpack_aggregate_outputs(outputs: Any) -> Tuple[Tuple[Union[None, bool], by
     return tuple((None, output) for output in outputs)
 
 
+def _address_to_bytes(address: Union[str, bytes]) -> bytes:
+    if isinstance(address, str):
+        address = bytes.fromhex(address[2:] if address[:2] in ('0x', '0X') else address)
+    if len(address) != 20:
+        raise Exception("Invalid address {}".format(address))
+    return address
+
+
+def _padded_length(length: int) -> int:
+    return (length + 31) // 32 * 32
+
+
+def _encode_call_array(selector: bytes, calls: List['W3Multicall.Call'], head_words: Sequence[int] = (), allow_failures: Optional[Sequence[bool]] = None) -> bytes:
+    """
+    Encode a multicall calldata ending with a (address,bytes)[] or (address,bool,bytes)[] array straight into a preallocated buffer
+    :param selector: 4 bytes method selector
+    :param calls: calls to encode (list of W3Multicall.Call or W3Multicall.CallBatch)
+    :param head_words: static arguments preceding the calls array (ex: requireSuccess of tryAggregate)
+    :param allow_failures: if not None, encode (address,bool,bytes)[] with the given allowFailure flags
+    """
+    if isinstance(calls, W3Multicall.CallBatch):
+        addresses, datas = calls.raw_addresses(), calls.raw_data()
+    else:
+        addresses, datas = [_address_to_bytes(call.address) for call in calls], [call.data for call in calls]
+    count = len(datas)
+    element_head = 64 if allow_failures is None else 96  # address [+ allowFailure] + bytes offset
+    array_offset = 32 * (len(head_words) + 1)
+    array_start = 4 + array_offset
+    heads = array_start + 32 + 32 * count  # array length + element offsets
+    size = heads
+    for data in datas:
+        size += element_head + 32 + _padded_length(len(data))  # element head + bytes length + padded bytes
+
+    buffer = bytearray(size)
+    buffer[0:4] = selector
+    position = 4
+    for word in head_words:
+        buffer[position:position + 32] = word.to_bytes(32, 'big')
+        position += 32
+    buffer[position:position + 32] = array_offset.to_bytes(32, 'big')
+    buffer[array_start:array_start + 32] = count.to_bytes(32, 'big')
+    head = array_start + 32
+    tail = heads
+    for i, (address, data) in enumerate(zip(addresses, datas)):
+        buffer[head:head + 32] = (tail - array_start - 32).to_bytes(32, 'big')
+        buffer[tail + 12:tail + 32] = address
+        if allow_failures is not None and allow_failures[i]:
+            buffer[tail + 63] = 1
+        buffer[tail + element_head - 32:tail + element_head] = element_head.to_bytes(32, 'big')
+        buffer[tail + element_head:tail + element_head + 32] = len(data).to_bytes(32, 'big')
+        buffer[tail + element_head + 32:tail + element_head + 32 + len(data)] = data
+        head += 32
+        tail += element_head + 32 + _padded_length(len(data))
+    return bytes(buffer)
+
+
+def _encode_aggregate_data(selector: bytes, calls: List['W3Multicall.Call']) -> bytes:
+    """
+    Encode aggregate((address,bytes)[]) calldata straight into a preallocated buffer.
+    Equivalent to _encode_data(selector, ['(address,bytes)[]'], [[[call.address, call.data] for call in calls]])
+    """
+    return _encode_call_array(selector, calls)
+
+
+def _encode_try_aggregate_data(selector: bytes, require_success: bool, calls: List['W3Multicall.Call']) -> bytes:
+    """
+    Encode tryAggregate(bool,(address,bytes)[]) calldata straight into a preallocated buffer
+    """
+    return _encode_call_array(selector, calls, head_words=(int(require_success),))
+
+
+def _encode_aggregate3_data(selector: bytes, calls: List['W3Multicall.Call'], allow_failures: Sequence[bool]) -> bytes:
+    """
+    Encode aggregate3((address,bool,bytes)[]) calldata straight into a preallocated buffer
+    """
+    return _encode_call_array(selector, calls, allow_failures=allow_failures)
+
+
+def _read_word(view: memoryview, offset: int) -> int:
+    if offset < 0 or offset + 32 > len(view):
+        raise Exception("Invalid multicall response: read out of bounds at {}".format(offset))
+    return int.from_bytes(view[offset:offset + 32], 'big')
+
+
+def _read_bytes(view: memoryview, offset: int) -> memoryview:
+    length = _read_word(view, offset)
+    if offset + 32 + length > len(view):
+        raise Exception("Invalid multicall response: bytes out of bounds at {}".format(offset))
+    return view[offset + 32:offset + 32 + length]
+
+
+def _decode_aggregate_output(output: Decodable) -> Tuple[int, List[memoryview]]:
+    """
+    Decode aggregate((address,bytes)[]) return data (uint256,bytes[]) without copying sub-results.
+    :return: block number and list of memoryview over each call return data
+    """
+    view = memoryview(output)
+    block_number = _read_word(view, 0)
+    array_start = _read_word(view, 32)
+    count = _read_word(view, array_start)
+    heads = array_start + 32
+    return block_number, [_read_bytes(view, heads + _read_word(view, heads + 32 * i)) for i in range(count)]
+
+
+def _decode_try_aggregate_output(output: Decodable) -> Tuple[Tuple[bool, memoryview], ...]:
+    """
+    Decode tryAggregate/aggregate3 return data (bool,bytes)[] without copying sub-results.
+    :return: tuple of (success, memoryview over the call return data)
+    """
+    view = memoryview(output)
+    array_start = _read_word(view, 0)
+    count = _read_word(view, array_start)
+    heads = array_start + 32
+    unpacked = []
+    for i in range(count):
+        element = heads + _read_word(view, heads + 32 * i)
+        unpacked.append((_read_word(view, element) != 0, _read_bytes(view, element + _read_word(view, element + 32))))
+    return tuple(unpacked)
+
+
 class W3Multicall:
     """
     Interface for multicall3.sol contract
@@ -109,56 +332,473 @@ class W3Multicall:
 
     MULTICALL_METHOD_NAME, MULTICALL_INPUT_TYPES, MULTICALL_OUTPUT_TYPES = _parse_signature("aggregate((address,bytes)[])(uint256,bytes[])")
     MULTICALL_SELECTOR = eth_utils.function_signature_to_4byte_selector(MULTICALL_METHOD_NAME)
+    TRY_AGGREGATE_METHOD_NAME, TRY_AGGREGATE_INPUT_TYPES, TRY_AGGREGATE_OUTPUT_TYPES = _parse_signature("tryAggregate(bool,(address,bytes)[])((bool,bytes)[])")
+    TRY_AGGREGATE_SELECTOR = eth_utils.function_signature_to_4byte_selector(TRY_AGGREGATE_METHOD_NAME)
+    AGGREGATE3_METHOD_NAME, AGGREGATE3_INPUT_TYPES, AGGREGATE3_OUTPUT_TYPES = _parse_signature("aggregate3((address,bool,bytes)[])((bool,bytes)[])")
+    AGGREGATE3_SELECTOR = eth_utils.function_signature_to_4byte_selector(AGGREGATE3_METHOD_NAME)
+
+    AGGREGATE = 'aggregate'
+    TRY_AGGREGATE = 'tryAggregate'
+    AGGREGATE3 = 'aggregate3'
+
+    class CallTemplate:
+        """
+        Pre-compiled method signature: parsing, selector hashing and encoder/decoder resolution are done once
+        """
+
+        def __init__(self, signature: str):
+            """
+            :param signature: method signature (Example: 'balanceOf(address)(uint256)')
+            """
+            self.signature = signature.replace(" ", "")
+            self.name, self.input_types, self.output_types = _parse_signature(self.signature)
+            self.selector = eth_utils.function_signature_to_4byte_selector(self.name)
+            self.encoder = _compile_encoder(self.input_types)
+            self.decoder = _compile_decoder(self.output_types)
+
+        def __repr__(self):
+            return self.signature
+
+        @staticmethod
+        def of(signature: str) -> 'W3Multicall.CallTemplate':
+            """
+            Return the cached CallTemplate of a signature
+            :param signature: method signature
+            """
+            return _get_call_template(signature.replace(" ", ""))
+
+        def encode(self, args) -> bytes:
+            return self.selector + self.encoder(args) if args else self.selector
+
+        def decode(self, output: Decodable) -> Any:
+            return self.decoder(output)
+
+        def call(self, address: str, args=None, allow_failure: Optional[bool] = None) -> 'W3Multicall.Call':
+            """
+            Create a W3Multicall.Call from this template
+            :param address: address of the contract to call
+            :param args: arguments of the contract method to call
+            :param allow_failure: (optional) see W3Multicall.Call
+            """
+            return W3Multicall.Call(address, self, args, allow_failure)
 
     class Call:
-        def __init__(self, address: str, signature: str, args=None):
+        """
+        Contract call. Signature metadata (name, types, selector, codecs) is shared through its W3Multicall.CallTemplate
+        """
+
+        __slots__ = ('address', 'template', 'args', 'data', 'allow_failure')
+
+        def __init__(self, address: str, signature: Union[str, 'W3Multicall.CallTemplate'], args=None, allow_failure: Optional[bool] = None):
             """
             :param address: address of the contract to call
-            :param signature: method signature to call (no space. Example: 'balanceOf(address)(uint256)')
+            :param signature: method signature to call (no space. Example: 'balanceOf(address)(uint256)') or W3Multicall.CallTemplate
             :param args: arguments of the contract method to call (use python tuple for solidity struct, python list for solidity arrays and python int for solidity uint/int)
+            :param allow_failure: (optional) aggregate3 only: allow this call to fail without reverting the whole multicall (default to not W3Multicall.require_success)
             """
+            template = signature if isinstance(signature, W3Multicall.CallTemplate) else W3Multicall.CallTemplate.of(signature)
             self.address = address
-            self.signature = signature.replace(" ", "")
+            self.template = template
 
             if args is not None and not isinstance(args, list) and not isinstance(args, tuple):
                 self.args = (args,)
             else:
                 self.args = args
-            self.name, self.input_types, self.output_types = _parse_signature(signature)
-            self.selector = eth_utils.function_signature_to_4byte_selector(self.name)
-            self.data = _encode_data(self.selector, self.input_types, self.args)
+            self.data = template.encode(self.args)
+            self.allow_failure = allow_failure
+
+        def __repr__(self):
+            return '{} {}'.format(self.address, self.signature)
+
+        @staticmethod
+        def of_encoded(address: str, template: 'W3Multicall.CallTemplate', data: bytes, allow_failure: Optional[bool] = None, args=None) -> 'W3Multicall.Call':
+            """
+            Create a W3Multicall.Call from already encoded calldata
+            """
+            call = W3Multicall.Call.__new__(W3Multicall.Call)
+            call.address, call.template, call.args, call.data, call.allow_failure = address, template, args, data, allow_failure
+            return call
+
+        @property
+        def signature(self) -> str:
+            return self.template.signature
+
+        @property
+        def name(self) -> str:
+            return self.template.name
+
+        @property
+        def input_types(self) -> List[TypeStr]:
+            return self.template.input_types
+
+        @property
+        def output_types(self) -> List[TypeStr]:
+            return self.template.output_types
+
+        @property
+        def selector(self) -> bytes:
+            return self.template.selector
+
+    class CallBatch(Sequence):
+        """
+        Compact sequence of calls to the same method: targets and calldata are stored in contiguous buffers. Items are W3Multicall.Call views created on access (without args)
+        """
+
+        def __init__(self, signature: Union[str, 'W3Multicall.CallTemplate'], allow_failure: Optional[bool] = None):
+            """
+            :param signature: method signature of the calls (Example: 'balanceOf(address)(uint256)') or W3Multicall.CallTemplate
+            :param allow_failure: (optional) see W3Multicall.Call
+            """
+            self.template = signature if isinstance(signature, W3Multicall.CallTemplate) else W3Multicall.CallTemplate.of(signature)
+            self.allow_failure = allow_failure
+            self.addresses = bytearray()
+            self.calldata = bytearray()
+            self.offsets = array('Q', [0])
+
+        def __repr__(self):
+            return "CallBatch({}, size={})".format(self.template, len(self))
 
-    def __init__(self, web3, address='0xcA11bde05977b3631167028862bE2a173976CA11', calls: List['W3Multicall.Call'] = None):
+        def __len__(self):
+            return len(self.offsets) - 1
+
+        def __getitem__(self, index):
+            if isinstance(index, slice):
+                return [self[i] for i in range(*index.indices(len(self)))]
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("CallBatch index out of range")
+            return W3Multicall.Call.of_encoded('0x' + self.addresses[20 * index:20 * index + 20].hex(), self.template,
+                                               bytes(self.calldata[self.offsets[index]:self.offsets[index + 1]]), self.allow_failure)
+
+        @staticmethod
+        def build(signature: Union[str, 'W3Multicall.CallTemplate'], addresses: Union[str, Sequence[str]], args: Optional[Sequence[Any]] = None, allow_failure: Optional[bool] = None) -> 'W3Multicall.CallBatch':
+            """
+            Build a CallBatch in bulk
+            :param signature: method signature of the calls or W3Multicall.CallTemplate
+            :param addresses: address of the contract of each call, or a single address shared by all the calls
+            :param args: (optional) arguments of each call (default: no argument)
+            :param allow_failure: (optional) see W3Multicall.Call
+            """
+            batch = W3Multicall.CallBatch(signature, allow_failure)
+            if isinstance(addresses, str):
+                if args is None:
+                    raise Exception("args required when a single address is given")
+                addresses = [addresses] * len(args)
+            count = len(addresses)
+            if args is not None and len(args) != count:
+                raise Exception("{} addresses for {} args".format(count, len(args)))
+            batch.addresses = bytearray(b''.join(_address_to_bytes(address) for address in addresses))
+            template = batch.template
+            if args is None:
+                if template.input_types:
+                    raise Exception("{} requires arguments".format(template))
+                batch.calldata = bytearray(template.selector * count)
+                batch.offsets = array('Q', range(0, 4 * count + 1, 4))
+                return batch
+            word_encoders = _static_word_encoders(template.input_types)
+            if word_encoders is not None:
+                # all inputs are static single words: calldata has a fixed size
+                size = 4 + 32 * len(word_encoders)
+                single = len(word_encoders) == 1
+                chunks = []
+                for arg in args:
+                    chunks.append(template.selector)
+                    if single and not isinstance(arg, (list, tuple)):
+                        chunks.append(word_encoders[0](arg))
+                    else:
+                        chunks.extend(encoder(value) for encoder, value in zip(word_encoders, arg))
+                batch.calldata = bytearray(b''.join(chunks))
+                if len(batch.calldata) != size * count:
+                    raise Exception("Invalid args for {}".format(template))
+                batch.offsets = array('Q', range(0, size * count + 1, size))
+                return batch
+            for arg in args:
+                batch.calldata += template.encode(arg if isinstance(arg, (list, tuple)) else (arg,))
+                batch.offsets.append(len(batch.calldata))
+            return batch
+
+        def append(self, call: Union['W3Multicall.Call', str], args=None):
+            """
+            Append a call
+            :param call: W3Multicall.Call to the same method, or address of the contract to call with args
+            :param args: arguments of the call when call is an address
+            """
+            if isinstance(call, W3Multicall.Call):
+                if call.template.signature != self.template.signature:
+                    raise Exception("{} does not match CallBatch signature {}".format(call, self.template))
+                address, data = call.address, call.data
+            else:
+                address = call
+                data = self.template.encode(args if args is None or isinstance(args, (list, tuple)) else (args,))
+            self.addresses += _address_to_bytes(address)
+            self.calldata += data
+            self.offsets.append(len(self.calldata))
+
+        def extend(self, calls: Iterable['W3Multicall.Call']):
+            for call in calls:
+                self.append(call)
+
+        def copy(self) -> 'W3Multicall.CallBatch':
+            batch = W3Multicall.CallBatch(self.template, self.allow_failure)
+            batch.addresses = bytearray(self.addresses)
+            batch.calldata = bytearray(self.calldata)
+            batch.offsets = array('Q', self.offsets)
+            return batch
+
+        def slice(self, start: int, stop: int) -> 'W3Multicall.CallBatch':
+            """
+            :return: CallBatch of the calls start to stop (excluded), copied from the contiguous buffers without creating any W3Multicall.Call
+            """
+            batch = W3Multicall.CallBatch(self.template, self.allow_failure)
+            batch.addresses = self.addresses[20 * start:20 * stop]
+            batch.calldata = self.calldata[self.offsets[start]:self.offsets[stop]]
+            base = self.offsets[start]
+            batch.offsets = array('Q', (offset - base for offset in self.offsets[start:stop + 1]))
+            return batch
+
+        def raw_addresses(self) -> List[memoryview]:
+            """
+            :return: 20 bytes address of each call (views of the address buffer)
+            """
+            view = memoryview(self.addresses)
+            return [view[i:i + 20] for i in range(0, len(view), 20)]
+
+        def raw_data(self) -> List[memoryview]:
+            """
+            :return: calldata of each call (views of the calldata buffer)
+            """
+            view = memoryview(self.calldata)
+            offsets = self.offsets
+            return [view[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    class LazyResults(Sequence):
+        """
+        Results of a W3Multicall.call holding the raw return data. Each entry is decoded on first access and cached
+        """
+
+        _NOT_DECODED = object()
+
+        def __init__(self, calls: Union[List['W3Multicall.Call'], 'W3Multicall.CallBatch'], block_number: int, unpacked: Sequence[Tuple[Union[None, bool], Decodable]]):
+            self.calls = calls
+            self.block_number = block_number
+            self.return_data: List[Decodable] = [output for _, output in unpacked]
+            self.successes: List[bool] = [success is None or bool(success) for success, _ in unpacked]
+            self._decoded: List[Any] = [W3Multicall.LazyResults._NOT_DECODED] * len(self.return_data)
+
+        def __repr__(self):
+            return "LazyResults(block={}, size={})".format(self.block_number, len(self))
+
+        def __len__(self):
+            return len(self.return_data)
+
+        def __getitem__(self, index):
+            if isinstance(index, slice):
+                return [self[i] for i in range(*index.indices(len(self)))]
+            value = self._decoded[index]
+            if value is W3Multicall.LazyResults._NOT_DECODED:
+                template = self.calls.template if isinstance(self.calls, W3Multicall.CallBatch) else self.calls[index].template
+                value = _decode_output(self.return_data[index], template.output_types, None, self.successes[index], template.decoder)
+                self._decoded[index] = value
+            return value
+
+        def raw(self, index: int) -> bytes:
+            """
+            :param index: index of the call
+            :return: undecoded return data of the call
+            """
+            return bytes(self.return_data[index])
+
+        def success(self, index: int) -> bool:
+            """
+            :param index: index of the call
+            :return: True if the call succeeded
+            """
+            return self.successes[index]
+
+        def columns(self, big_int: str = BIG_INT_LIMBS) -> 'W3MulticallColumns':
+            """
+            Decode all the results at once into one NumPy array per output field (requires numpy and calls sharing the same static output types, see decode_columns)
+            :param big_int: (default 'limbs') representation of integers wider than 64 bits: 'limbs', 'object' or 'float'
+            :return: W3MulticallColumns
+            """
+            if isinstance(self.calls, W3Multicall.CallBatch):
+                return decode_columns(self.calls.template.output_types, self.return_data, self.successes, big_int, self.block_number)
+            output_types = self.calls[0].output_types if self.calls else []
+            if any(call.output_types != output_types for call in self.calls):
+                raise Exception("Columnar decoding requires calls sharing the same output types")
+            return decode_columns(output_types, self.return_data, self.successes, big_int, self.block_number)
+
+    def __init__(self, web3, address='0xcA11bde05977b3631167028862bE2a173976CA11', calls: List['W3Multicall.Call'] = None, require_success: bool = True, method: str = AGGREGATE,
+                 cache: Optional['W3MulticallCache'] = None, chain_id: Any = None, metrics: Optional['W3MulticallMetrics'] = None):
         """
         :param web3: Web3 instance
         :param address: (optional) address of the multicall3.sol contract
-        :param calls: (optional) list of W3Multicall.Call to perform
+        :param calls: (optional) list of W3Multicall.Call or W3Multicall.CallBatch to perform
+        :param require_success: (default True) revert the whole multicall if a call fails. If False, failed calls return None and are flagged in W3Multicall.LazyResults.successes
+        :param method: (default 'aggregate') multicall3 method: W3Multicall.AGGREGATE, W3Multicall.TRY_AGGREGATE or W3Multicall.AGGREGATE3. 'aggregate' falls back on 'tryAggregate' when require_success is False
+        :param cache: (optional) W3MulticallCache serving results of calls already made at the same block
+        :param chain_id: (optional) chain identifier used in the cache keys when a cache is shared between chains
+        :param metrics: (optional) W3MulticallMetrics recording the encode, RPC and decode time of each call()
         """
+        if method not in (W3Multicall.AGGREGATE, W3Multicall.TRY_AGGREGATE, W3Multicall.AGGREGATE3):
+            raise Exception("Unknown multicall method '{}'".format(method))
         self.web3 = web3
         self.address = address
-        self.calls: List['W3Multicall.Call'] = [] if calls is None else calls.copy()
-        self.require_success = True
+        self.calls: Union[List['W3Multicall.Call'], 'W3Multicall.CallBatch'] = [] if calls is None else calls.copy()
+        self.require_success = require_success
+        self.method = method
+        self.cache = cache
+        self.chain_id = chain_id
+        self.metrics = metrics
 
     def add(self, call: 'W3Multicall.Call'):
         self.calls.append(call)
 
-    def call(self) -> list:
-        args = self._get_args()
-        data = _encode_data(W3Multicall.MULTICALL_SELECTOR, W3Multicall.MULTICALL_INPUT_TYPES, args)
-        eth_call_params = {
+    def call(self, lazy: bool = False, block_identifier: Any = None) -> Union[list, 'W3Multicall.LazyResults']:
+        """
+        Execute all the calls in a single eth_call
+        :param lazy: (default False) return a W3Multicall.LazyResults that decodes each result on first access
+        :param block_identifier: (optional) block number, hash or tag of the eth_call (default 'latest')
+        :return: list of decoded results (or W3Multicall.LazyResults if lazy)
+        """
+        cached = self._get_cached(block_identifier)
+        missing = self._get_missing(cached)
+        start = time.time()
+        params = self._get_eth_call_params(missing) if missing else None
+        encoded_at = time.time()
+        rpc_response = self.web3.eth.call(params, block_identifier) if missing else None
+        received_at = time.time()
+        results = self._decode_response(rpc_response, lazy, cached)
+        self._observe(missing, start, encoded_at, received_at)
+        return results
+
+    def _observe(self, missing: List['W3Multicall.Call'], start: float, encoded_at: float, received_at: float):
+        """
+        Record the time split of a call() (decode only covers the multicall envelope when lazy)
+        """
+        if self.metrics is None:
+            return
+        self.metrics.inc('multicall_cache_hits_total', len(self.calls) - len(missing))
+        if not missing:
+            return
+        self.metrics.observe('multicall_calls', len(missing), SIZE_BUCKETS)
+        self.metrics.observe('multicall_encode_seconds', encoded_at - start)
+        self.metrics.observe('multicall_rpc_seconds', received_at - encoded_at)
+        self.metrics.observe('multicall_decode_seconds', time.time() - received_at)
+
+    def _get_missing(self, cached: Tuple[Any, bool, List[Optional[Tuple[bool, bytes]]]]) -> Union[List['W3Multicall.Call'], 'W3Multicall.CallBatch']:
+        """
+        :return: calls not served by the cache (self.calls itself if none is cached)
+        """
+        hits = cached[2]
+        if all(hit is None for hit in hits):
+            return self.calls
+        return [call for call, hit in zip(self.calls, hits) if hit is None]
+
+    def _get_cached(self, block_identifier: Any) -> Tuple[Any, bool, List[Optional[Tuple[bool, bytes]]]]:
+        """
+        :return: block key in the cache, True if block_identifier is 'latest' and the cached (success, return data) of each call (None if not cached)
+        """
+        if self.cache is None:
+            return None, False, [None] * len(self.calls)
+        block, latest = self.cache.resolve_block(block_identifier)
+        if block is None:
+            return None, latest, [None] * len(self.calls)
+        return block, latest, [self.cache.get(self.chain_id, block, self.address, call) for call in self.calls]
+
+    def _get_eth_call_params(self, calls: Optional[List['W3Multicall.Call']] = None) -> dict:
+        calls = self.calls if calls is None else calls
+        method = self._get_method()
+        if method == W3Multicall.AGGREGATE:
+            data = _encode_aggregate_data(W3Multicall.MULTICALL_SELECTOR, calls)
+        elif method == W3Multicall.TRY_AGGREGATE:
+            data = _encode_try_aggregate_data(W3Multicall.TRY_AGGREGATE_SELECTOR, self.require_success, calls)
+        else:
+            data = _encode_aggregate3_data(W3Multicall.AGGREGATE3_SELECTOR, calls, self._get_allow_failures(calls))
+        return {
             'to': self.address,
             'data': data
         }
-        rpc_response = self.web3.eth.call(eth_call_params)
-        aggregated = _decode_output(rpc_response, W3Multicall.MULTICALL_OUTPUT_TYPES)
-        unpacked = _unpack_aggregate_outputs(aggregated[1])
+
+    def _decode_response(self, rpc_response: Optional[Decodable], lazy: bool, cached: Optional[Tuple[Any, bool, List[Optional[Tuple[bool, bytes]]]]] = None) -> Union[list, 'W3Multicall.LazyResults']:
+        block, latest, hits = (None, False, [None] * len(self.calls)) if cached is None else cached
+        block_number = block if isinstance(block, int) else None
+        fetched: Sequence[Tuple[Union[None, bool], Decodable]] = ()
+        if rpc_response is not None:
+            if self._get_method() == W3Multicall.AGGREGATE:
+                block_number, return_data = _decode_aggregate_output(rpc_response)
+                fetched = _unpack_aggregate_outputs(return_data)
+            else:
+                fetched = _decode_try_aggregate_output(rpc_response)
+            if self.cache is not None:
+                self._store(self._get_missing(cached), fetched, block, latest, block_number)
+
+        fetched_iterator = iter(fetched)
+        unpacked = [next(fetched_iterator) if hit is None else hit for hit in hits]
+        if lazy:
+            return W3Multicall.LazyResults(self.calls.copy(), block_number, unpacked)
+        if isinstance(self.calls, W3Multicall.CallBatch):
+            template = self.calls.template
+            return [_decode_output(output, template.output_types, None, success is None or success, template.decoder) for success, output in unpacked]
         outputs = []
         for call, (success, output) in zip(self.calls, unpacked):
-            call_output = _decode_output(output, call.output_types, None, True)
+            call_output = _decode_output(output, call.output_types, None, success is None or success, call.template.decoder)
             outputs.append(call_output)
         return outputs
 
+    def _store(self, calls: List['W3Multicall.Call'], fetched: Sequence[Tuple[Union[None, bool], Decodable]], block: Any, latest: bool, block_number: Optional[int]):
+        if self.cache is None:
+            return
+        if latest:
+            if block_number is None:
+                return  # block of the results unknown: only aggregate returns it
+            self.cache.set_head(block_number)
+            block = block_number
+        if block is None:
+            return
+        for call, (success, output) in zip(calls, fetched):
+            self.cache.put(self.chain_id, block, self.address, call, success is None or success, output)
+
+    def _get_method(self) -> str:
+        if self.method == W3Multicall.AGGREGATE and self.require_success is not True:
+            return W3Multicall.TRY_AGGREGATE
+        return self.method
+
+    def _get_allow_failures(self, calls: Optional[List['W3Multicall.Call']] = None) -> List[bool]:
+        calls = self.calls if calls is None else calls
+        if isinstance(calls, W3Multicall.CallBatch):
+            return [not self.require_success if calls.allow_failure is None else calls.allow_failure] * len(calls)
+        return [not self.require_success if call.allow_failure is None else call.allow_failure for call in calls]
+
     def _get_args(self) -> List[Union[bool, List[List[Any]]]]:
-        if self.require_success is True:
+        method = self._get_method()
+        if method == W3Multicall.AGGREGATE3:
+            return [[[call.address, allow_failure, call.data] for call, allow_failure in zip(self.calls, self._get_allow_failures())]]
+        if method == W3Multicall.AGGREGATE:
             return [[[call.address, call.data] for call in self.calls]]
         return [self.require_success, [[call.address, call.data] for call in self.calls]]
+
+
+class AsyncW3Multicall(W3Multicall):
+    """
+    Interface for multicall3.sol contract using an AsyncWeb3 instance
+    """
+
+    async def call(self, lazy: bool = False, block_identifier: Any = None) -> Union[list, 'W3Multicall.LazyResults']:
+        """
+        Execute all the calls in a single eth_call
+        :param lazy: (default False) return a W3Multicall.LazyResults that decodes each result on first access
+        :param block_identifier: (optional) block number, hash or tag of the eth_call (default 'latest')
+        :return: list of decoded results (or W3Multicall.LazyResults if lazy)
+        """
+        cached = self._get_cached(block_identifier)
+        missing = self._get_missing(cached)
+        start = time.time()
+        params = self._get_eth_call_params(missing) if missing else None
+        encoded_at = time.time()
+        rpc_response = await self.web3.eth.call(params, block_identifier) if missing else None
+        received_at = time.time()
+        results = self._decode_response(rpc_response, lazy, cached)
+        self._observe(missing, start, encoded_at, received_at)
+        return results
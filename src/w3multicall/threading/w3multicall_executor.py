@@ -1,126 +1,554 @@
-from typing import List, Dict, Union, Callable
+from typing import List, Dict, Union, Tuple, Any, Optional
+import concurrent.futures
+import heapq
+import itertools
 import logging
 import threading
 from multiprocessing.pool import ThreadPool
 import time
-import datetime
 
 from ..multicall import W3Multicall
-from ..w3.w3 import W3Pool
+from ..cache import W3MulticallCache
+from ..metrics import W3MulticallMetrics, SIZE_BUCKETS
+from ..w3.w3 import W3, W3Pool
+from ..w3.json_rpc import batch_eth_call, supports_batch_eth_call
+from ..batching import W3MulticallBatcher, _is_provider_error, _is_batch_limit_error
 
 
-class W3MulticallExecutor:
+class W3MulticallExecutor(W3MulticallBatcher):
     """
     Multi thread W3Multicall processor
     """
 
-    class Task:
-        def __init__(self):
-            self.sync = threading.Condition()
-            self.creation_time = time.time()
-            self.w3_calls: Dict[int, W3Multicall.Call] = {}
+    class Task(W3MulticallBatcher.Task):
+        def __init__(self, block_identifier: Any = None, priority: int = 1):
+            super().__init__(block_identifier, priority)
+            self.last_submit_time = self.creation_time
+            self.trigger_time: Union[float, None] = None
+            self.start_time: Union[float, None] = None
+            self.items: Union[List[Tuple[int, W3Multicall.Call]], None] = None
             self.w3_results = None
+            self.w3_exceptions: Dict[int, Exception] = {}
             self.exception: Union[Exception, None] = None
 
-        def __repr__(self):
-            return "{}|{}".format(datetime.datetime.fromtimestamp(self.creation_time), len(self.w3_calls))
-
-        def get(self, key):
-            with self.sync:
-                if self.exception is None and self.w3_results is None:
-                    self.sync.wait()
-                if self.exception is not None:
-                    raise self.exception
-                if self.w3_results is None or key not in self.w3_results:
-                    raise Exception("Results not available or invalid key")
-                return self.w3_results[key]
-
-    class Future:
-        def __init__(self, task: 'W3MulticallExecutor.Task', call_key: int):
+    class Future(concurrent.futures.Future):
+        """
+        concurrent.futures.Future of a submitted call. Cancelling is possible until the call is sent
+        """
+
+        def __init__(self, task: 'W3MulticallExecutor.Task', call_key: int, deadline: Union[float, None] = None):
+            super().__init__()
             self.task = task
             self.call_key = call_key
+            self.deadline = deadline
+
+        def get(self, timeout: Union[float, None] = None):
+            """
+            Wait for the result of the call
+            :param timeout: (optional) max seconds to wait (raise concurrent.futures.TimeoutError)
+            """
+            return self.result(timeout)
+
+        def cancel(self) -> bool:
+            with self._condition:
+                pending = not self.running() and not self.done()
+                if not super().cancel():
+                    return False
+                if pending:
+                    self.set_running_or_notify_cancel()  # wake concurrent.futures.wait() and as_completed()
+                return True
 
-        def get(self):
-            return self.task.get(self.call_key)
+        def expired(self, now: float) -> bool:
+            return self.deadline is not None and now >= self.deadline
 
-    def __init__(self, w3_pool: W3Pool, processes: int, multicall_contract_address='0xcA11bde05977b3631167028862bE2a173976CA11', batch_max_size: int = 20, tick_duration: float = 0.05, logger: Union[logging.Logger, None] = None):
+        def start(self, now: float) -> bool:
+            """
+            Mark the Future as running (no longer cancellable) unless it is done, cancelled or expired (then failed with concurrent.futures.TimeoutError)
+            :return: True if the call must be sent for this Future
+            """
+            with self._condition:
+                if self.running():
+                    return True
+                if self.done():
+                    return False
+                if self.expired(now):
+                    self.set_exception(concurrent.futures.TimeoutError("Deadline of call {} exceeded before it was sent".format(self.task.w3_calls[self.call_key])))
+                    return False
+                return self.set_running_or_notify_cancel()
+
+    def __init__(self, w3_pool: W3Pool, processes: int, multicall_contract_address='0xcA11bde05977b3631167028862bE2a173976CA11', batch_max_size: int = 20, tick_duration: float = 0.05, logger: Union[logging.Logger, None] = None,
+                 require_success: bool = True, method: str = W3Multicall.AGGREGATE, batch_max_bytes: Union[int, None] = None, batch_max_gas: Union[int, None] = None, default_call_gas: int = 50000,
+                 linger: Union[float, None] = None, max_wait: Union[float, None] = None, dedup: bool = True, cache: Optional[W3MulticallCache] = None, chain_id: Any = None,
+                 json_rpc_batch_size: int = 1, metrics: Optional[W3MulticallMetrics] = None, lane_lingers: Optional[Dict[int, float]] = None, router=None):
         """
         :param w3_pool: W3Pool
         :param processes: number of thread to process W3Multicall
         :param multicall_contract_address: (optional) address of the multicall3.sol contract
         :param batch_max_size: (default 20) max call per W3Multicall
-        :param tick_duration: (default 0.05) update delay
+        :param tick_duration: (default 0.05) default linger
         :param logger: (optional) logging.Logger
+        :param require_success: (default True) if False, a failing call only fails its own Future instead of the whole batch
+        :param method: (default 'aggregate') multicall3 method (see W3Multicall)
+        :param batch_max_bytes: (optional) max estimated calldata bytes per W3Multicall
+        :param batch_max_gas: (optional) max estimated gas per W3Multicall (typically the provider eth_call gas cap). Gas per signature is learned from out-of-gas failures
+        :param default_call_gas: (default 50000) initial gas estimate of an unknown signature
+        :param linger: (default tick_duration) delay to wait for more calls before sending a batch. Without max_wait, the delay starts at the first call of the batch
+        :param max_wait: (optional) if set, linger restarts at each submitted call but a batch never waits more than max_wait after its first call
+        :param dedup: (default True) identical calls pending or in flight share the same slot
+        :param cache: (optional) W3MulticallCache. Cached calls are resolved at submission and removed from the batches
+        :param chain_id: (optional) chain identifier used in the cache keys
+        :param json_rpc_batch_size: (default 1) max W3Multicall sent in a single JSON-RPC batch HTTP request when several batches are ready at once (every W3 of the pool must be a W3HTTPTransport or use an HTTPProvider)
+        :param metrics: (optional) W3MulticallMetrics recording queue wait, batch fill, encode/RPC/decode time, retries, errors and in-flight tasks
+        :param lane_lingers: (default {PRIORITY_HIGH: 0}) linger per priority lane (other lanes use linger). Calls of different priorities are batched separately and higher priority batches are executed first
+        :param router: (optional) W3MulticallRouter providing the lock, flusher and worker threads (see W3MulticallRouter.add_chain())
         """
-
+        if json_rpc_batch_size > 1 and not all(supports_batch_eth_call(w3.web3) for w3 in w3_pool.w3s):
+            raise Exception("json_rpc_batch_size > 1 requires W3HTTPTransport or HTTPProvider instances")
+        super().__init__(multicall_contract_address, batch_max_size, tick_duration, logger, require_success, method, batch_max_bytes, batch_max_gas, default_call_gas, dedup, cache,
+                         chain_id, metrics, lane_lingers)
         self.w3_pool = w3_pool
         self.processes = processes
-        self.multicall_contract_address = multicall_contract_address
-        self.batch_max_size = batch_max_size
-        self.tick_duration = tick_duration
-        self.logger = logger
-        self.pending_task: Union[W3MulticallExecutor.Task, None] = None
-        self.lock = threading.RLock()
+        self.linger = tick_duration if linger is None else linger
+        self.max_wait = max_wait
+        self.json_rpc_batch_size = json_rpc_batch_size
+        self.ready_tasks: List[Tuple[int, int, W3MulticallExecutor.Task]] = []  # heap of (priority, sequence, task)
+        self.ready_sequence = itertools.count()
+        self.router = router
+        self.shutdown_requested = False
+        if router is not None:
+            self.lock = router.lock
+            self.condition = router.condition
+            self.thread_pool = router.thread_pool
+            self.flusher = None
+            return
+        self.condition = threading.Condition(self.lock)
 
         def thread_pool_initializer():
             t = threading.current_thread()
             t.name = 'W3MulticallExecutor-{}'.format(t.name)
 
         self.thread_pool = ThreadPool(processes=processes, initializer=thread_pool_initializer)
-        threading.Thread(target=self.__loop, daemon=True).start()
+        self.flusher = threading.Thread(target=self.__loop, name='W3MulticallExecutor-flusher', daemon=True)
+        self.flusher.start()
+
+    def __enter__(self) -> 'W3MulticallExecutor':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
 
     def __loop(self):
-        while True:
-            self.__check_pending_task()
-            time.sleep(self.tick_duration)
+        """
+        Sleep until the earliest deadline of the pending tasks (or until a task is submitted when idle) and trigger the due ones
+        """
+        with self.condition:
+            while not self.shutdown_requested:
+                deadline = self.flush_due()
+                self.condition.wait(None if deadline is None else deadline - time.time())
 
-    def __check_pending_task(self):
+    def flush_due(self) -> Union[float, None]:
+        """
+        Trigger the pending tasks whose deadline is reached
+        :return: earliest deadline of the remaining pending tasks (None if there is none)
+        """
         with self.lock:
-            if self.pending_task is not None and (time.time() >= self.pending_task.creation_time + self.tick_duration or len(self.pending_task.w3_calls) >= self.batch_max_size):
-                if self.logger is not None:
-                    self.logger.debug("Triggering task {}".format(self.pending_task))
-                task = self.pending_task
-                self.pending_task = None
-                self.thread_pool.apply_async(func=self.__execute, args=(task,))
+            now = time.time()
+            for task in [task for task in self.pending_tasks.values() if self.__deadline(task) <= now]:
+                self._trigger_pending_task(task)
+            return min((self.__deadline(task) for task in self.pending_tasks.values()), default=None)
+
+    def __deadline(self, task: 'W3MulticallExecutor.Task') -> float:
+        linger = self.lane_lingers.get(task.priority, self.linger)
+        if self.max_wait is None:
+            deadline = task.creation_time + linger
+        else:
+            deadline = min(task.last_submit_time + linger, task.creation_time + self.max_wait)
+        if task.call_deadline is not None:
+            deadline = min(deadline, task.call_deadline - linger)  # leave the call a chance to be sent before its deadline
+        return deadline
+
+    def __check_pending_task(self, task: 'W3MulticallExecutor.Task'):
+        with self.lock:
+            if time.time() >= self.__deadline(task) or self._is_full(task):
+                self._trigger_pending_task(task)
+
+    def _new_task(self, block_identifier: Any, priority: int) -> 'W3MulticallExecutor.Task':
+        return W3MulticallExecutor.Task(block_identifier, priority)
+
+    def _trigger_pending_task(self, task: 'W3MulticallExecutor.Task'):
+        with self.lock:
+            if self.logger is not None:
+                self.logger.debug("Triggering task {}".format(task))
+            if self.pending_tasks.get(task.batch_key) is task:
+                del self.pending_tasks[task.batch_key]
+            task.trigger_time = time.time()
+            self._observe_trigger(task, task.trigger_time)
+            heapq.heappush(self.ready_tasks, (task.priority, next(self.ready_sequence), task))
+            if self.router is None:
+                self.thread_pool.apply_async(func=self.execute_ready)
+            else:
+                self.router.dispatch()
+
+    def __task_started(self, task: 'W3MulticallExecutor.Task'):
+        if task.start_time is not None:
+            return
+        task.start_time = time.time()
+        if self.metrics is not None:
+            self.metrics.observe('executor_queue_wait_seconds', task.start_time - (task.creation_time if task.trigger_time is None else task.trigger_time))
+            self.metrics.add('executor_inflight_tasks', 1)
+
+    def __task_completed(self, task: 'W3MulticallExecutor.Task'):
+        if self.metrics is None:
+            return
+        now = time.time()
+        failures = task.call_count if task.exception is not None or (task.call_batch is not None and task.w3_exceptions) else len(task.w3_exceptions)
+        self.metrics.add('executor_inflight_tasks', -1)
+        self.metrics.observe('executor_task_seconds', now - task.start_time)
+        self.metrics.inc('executor_calls_total', task.call_count - failures, status='success')
+        self.metrics.inc('executor_calls_total', failures, status='failure')
+        self.metrics.emit('task', calls=task.call_count, failures=failures, queue_wait=task.start_time - (task.trigger_time or task.creation_time), duration=now - task.start_time,
+                          block_identifier=task.block_identifier)
 
     def __execute(self, task: 'W3MulticallExecutor.Task'):
         if self.logger is not None:
             self.logger.debug("Executing task {}".format(task))
-        w3m = W3Multicall(self.w3_pool.use(), self.multicall_contract_address)
-        for k in task.w3_calls:
-            w3m.add(task.w3_calls[k])
-        with task.sync:
+        self.__task_started(task)
+        try:
+            task.w3_results = {}
+            items = self.__prepare(task)
+            if task.call_batch is None:
+                self.__execute_calls(task, items)
+            elif items:
+                self.__execute_call_batch(task, 0, len(task.call_batch))
+        except Exception as e:
+            task.exception = e
+        self._release(task)
+        self.__resolve(task)
+        self.__task_completed(task)
+        if self.logger is not None:
+            self.logger.debug("Task {} completed".format(task))
+
+    def __prepare(self, task: 'W3MulticallExecutor.Task') -> List[Tuple[int, W3Multicall.Call]]:
+        """
+        Drop the calls whose Futures are all cancelled or expired and mark the others as running (no longer cancellable)
+        :return: (call key, call) to send
+        """
+        if task.items is not None:
+            return task.items
+        now = time.time()
+        items = []
+        with self.lock:
+            for k, call in task.w3_calls.items():
+                live = False
+                for future in task.w3_futures.get(k, ()):
+                    live = future.start(now) or live
+                if live:
+                    items.append((k, call))
+                else:
+                    task.w3_exceptions[k] = concurrent.futures.CancelledError("Call {} cancelled or expired".format(call))
+                    self._release(task, [k])
+            if self.metrics is not None and len(items) < len(task.w3_calls):
+                self.metrics.inc('executor_dropped_calls_total', task.call_count if task.call_batch is not None else len(task.w3_calls) - len(items))
+        task.items = items
+        return items
+
+    def __drop_expired(self, task: 'W3MulticallExecutor.Task', items: List[Tuple[int, W3Multicall.Call]]) -> List[Tuple[int, W3Multicall.Call]]:
+        """
+        Drop the calls whose Futures all expired while waiting for a W3 instance
+        """
+        now = time.time()
+        live = []
+        for k, call in items:
+            futures = task.w3_futures.get(k, ())
+            if futures and all(future.expired(now) for future in futures):
+                task.w3_exceptions[k] = concurrent.futures.TimeoutError("Deadline of call {} exceeded before it was sent".format(call))
+            else:
+                live.append((k, call))
+        return live
+
+    def __resolve(self, task: 'W3MulticallExecutor.Task'):
+        """
+        Complete the Futures of a task with its results
+        """
+        if task.call_batch is not None:
+            self.__resolve_call_batch(task)
+            return
+        for k, futures in list(task.w3_futures.items()):
+            for future in list(futures):
+                if future.done():
+                    continue
+                try:
+                    if task.exception is not None:
+                        future.set_exception(task.exception)
+                    elif k in task.w3_exceptions:
+                        future.set_exception(task.w3_exceptions[k])
+                    elif task.w3_results is not None and k in task.w3_results:
+                        future.set_result(task.w3_results[k])
+                    else:
+                        future.set_exception(Exception("Results not available"))
+                except concurrent.futures.InvalidStateError:
+                    pass  # cancelled concurrently
+
+    def __resolve_call_batch(self, task: 'W3MulticallExecutor.Task'):
+        """
+        Complete the Future of a CallBatch once all its slices are resolved (or with the first failure of a slice)
+        """
+        future = task.w3_futures[0][0]
+        exception = task.exception if task.exception is not None else task.w3_exceptions.get(0)
+        results = task.call_batch_results.complete()
+        if future.done():
+            return
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            elif results is not None:
+                future.set_result(results)
+        except concurrent.futures.InvalidStateError:
+            pass  # cancelled concurrently
+
+    def execute_ready(self):
+        """
+        Execute the highest priority tasks triggered but not yet picked up by a thread, up to json_rpc_batch_size per HTTP request. Called by the worker threads
+        """
+        with self.lock:
+            tasks = [heapq.heappop(self.ready_tasks)[2] for _ in range(min(self.json_rpc_batch_size, len(self.ready_tasks)))]
+        if len(tasks) == 1:
+            self.__execute(tasks[0])
+        elif tasks:
+            self.__execute_json_rpc_batch(tasks)
+
+    def __execute_json_rpc_batch(self, tasks: List['W3MulticallExecutor.Task']):
+        """
+        Execute one W3Multicall per task in a single JSON-RPC batch. Tasks failing on their own (or too large for the provider) fall back to __execute
+        """
+        if self.logger is not None:
+            self.logger.debug("Executing tasks {} in a JSON-RPC batch".format(tasks))
+        for task in tasks:
+            self.__task_started(task)
+            self.__prepare(task)
+
+        task_calls = [task.call_batch if task.call_batch is not None else [call for _, call in task.items] for task in tasks]
+
+        def batch_multicall(w3: W3) -> Tuple[W3, List[Union[W3Multicall.LazyResults, Exception, None]]]:
+            w3ms = [W3Multicall(w3.web3, self.multicall_contract_address, calls, require_success=self.require_success, method=self.method, cache=self.cache, chain_id=self.chain_id,
+                                metrics=self.metrics)
+                    if task.items and (w3.max_batch_size is None or len(calls) <= w3.max_batch_size) else None for task, calls in zip(tasks, task_calls)]
+            cached = [None if w3m is None else w3m._get_cached(task.block_identifier) for task, w3m in zip(tasks, w3ms)]
+            missing = [None if w3m is None else [call for call, hit in zip(w3m.calls, hits[2]) if hit is None] for w3m, hits in zip(w3ms, cached)]
+            eth_calls = [(w3m._get_eth_call_params(calls), task.block_identifier) for task, w3m, calls in zip(tasks, w3ms, missing) if calls]
+            rpc_responses = iter(batch_eth_call(w3.web3, eth_calls) if eth_calls else [])
+            results = []
+            for w3m, hits, calls in zip(w3ms, cached, missing):
+                rpc_response = next(rpc_responses) if calls else None
+                if w3m is None or isinstance(rpc_response, Exception):
+                    results.append(rpc_response)
+                else:
+                    results.append(w3m._decode_response(rpc_response, True, hits))
+            return w3, results
+
+        try:
+            w3, batch_results = self.w3_pool.run(batch_multicall, is_provider_error=_is_provider_error)
+            if self.metrics is not None:
+                self.metrics.inc('executor_json_rpc_batches_total', provider=w3.label, status='success')
+                self.metrics.observe('executor_json_rpc_batch_multicalls', len(tasks), SIZE_BUCKETS)
+        except Exception as e:
+            if self.metrics is not None:
+                self.metrics.inc('executor_json_rpc_batches_total', status='error')
+            if len(tasks) > 1 and _is_batch_limit_error(e):
+                half = len(tasks) // 2
+                self.__execute_json_rpc_batch(tasks[:half])
+                self.__execute_json_rpc_batch(tasks[half:])
+            else:
+                for task in tasks:
+                    self.__execute(task)
+            return
+
+        for task, calls, results in zip(tasks, task_calls, batch_results):
+            if task.items and (results is None or (isinstance(results, Exception) and _is_batch_limit_error(results))):
+                self.__execute(task)
+                continue
+            task.w3_results = {}
+            if isinstance(results, Exception):
+                for k, _ in task.items:
+                    task.w3_exceptions[k] = results
+            elif results is not None and task.call_batch is not None:
+                self._learn_success(w3, calls)
+                task.call_batch_results.put(task.call_batch_offset, results)
+            elif results is not None:
+                self._learn_success(w3, calls)
+                for i, (k, call) in enumerate(task.items):
+                    if results.success(i):
+                        task.w3_results[k] = results[i]
+                    else:
+                        task.w3_exceptions[k] = Exception("Call {} failed".format(call))
+            self._release(task)
+            self.__resolve(task)
+            self.__task_completed(task)
+
+    def __multicall(self, calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], block_identifier: Any):
+        def multicall(w3: W3):
+            w3m = W3Multicall(w3.web3, self.multicall_contract_address, calls, require_success=self.require_success, method=self.method, cache=self.cache, chain_id=self.chain_id,
+                              metrics=self.metrics)
+            return w3m.call(lazy=True, block_identifier=block_identifier)
+        return multicall
+
+    def __cached_future(self, call: W3Multicall.Call, cached: Tuple[bool, bytes]) -> 'W3MulticallExecutor.Future':
+        task = W3MulticallExecutor.Task()
+        task.w3_calls[0] = call
+        task.w3_results = {}
+        future = W3MulticallExecutor.Future(task, 0)
+        if cached[0]:
+            task.w3_results[0] = W3Multicall.LazyResults([call], None, [cached])[0]
+            future.set_result(task.w3_results[0])
+        else:
+            task.w3_exceptions[0] = Exception("Call {} failed".format(call))
+            future.set_exception(task.w3_exceptions[0])
+        return future
+
+    def __execute_calls(self, task: 'W3MulticallExecutor.Task', items: List[Tuple[int, W3Multicall.Call]]):
+        """
+        Execute the calls, splitting them according to the provider max batch size and bisecting them upon gas or size failure
+        """
+        while items:
+            w3 = self.w3_pool.acquire()
+            items = self.__drop_expired(task, items)
+            if not items:
+                break
+            batch = items if w3.max_batch_size is None else items[:w3.max_batch_size]
+            items = items[len(batch):]
             try:
                 start = time.time()
-                results = w3m.call()
+                results = self.w3_pool.run(self.__multicall([call for _, call in batch], task.block_identifier), w3, is_provider_error=_is_provider_error)
                 elapsed = time.time() - start
                 if self.logger is not None:
                     self.logger.debug("Multicall executed in {}s".format(elapsed))
-                task.w3_results = {}
-                for k in task.w3_calls:
-                    task.w3_results[k] = results[k]
             except Exception as e:
-                task.exception = e
-            finally:
-                task.sync.notify_all()
-        if self.logger is not None:
-            self.logger.debug("Task {} completed".format(task))
+                if self._batch_failed(w3, task, [call for _, call in batch], e, time.time() - start):
+                    half = len(batch) // 2
+                    self.__execute_calls(task, batch[:half])
+                    self.__execute_calls(task, batch[half:])
+                else:
+                    for k, _ in batch:
+                        task.w3_exceptions[k] = e
+                continue
+
+            for i, (k, call) in enumerate(batch):
+                if results.success(i):
+                    task.w3_results[k] = results[i]
+                else:
+                    task.w3_exceptions[k] = Exception("Call {} failed".format(call))
+            self._batch_succeeded(w3, task, [call for _, call in batch], elapsed, time.time() - start - elapsed)
 
-    def submit(self, call: W3Multicall.Call) -> Future:
+    def __execute_call_batch(self, task: 'W3MulticallExecutor.Task', start: int, stop: int):
+        """
+        Execute the calls start to stop (excluded) of the CallBatch slice of a task, splitting them according to the provider max batch size and bisecting them upon gas
+        or size failure
+        """
+        while start < stop and 0 not in task.w3_exceptions:
+            w3 = self.w3_pool.acquire()
+            if not self.__drop_expired(task, task.items):
+                break
+            end = stop if w3.max_batch_size is None else min(stop, start + w3.max_batch_size)
+            calls = task.call_batch.slice(start, end) if end - start < len(task.call_batch) else task.call_batch
+            try:
+                call_start = time.time()
+                results = self.w3_pool.run(self.__multicall(calls, task.block_identifier), w3, is_provider_error=_is_provider_error)
+                elapsed = time.time() - call_start
+            except Exception as e:
+                if self._batch_failed(w3, task, calls, e, time.time() - call_start):
+                    half = (start + end) // 2
+                    self.__execute_call_batch(task, start, half)
+                    self.__execute_call_batch(task, half, end)
+                else:
+                    task.w3_exceptions[0] = e
+                start = end
+                continue
+            task.call_batch_results.put(task.call_batch_offset + start, results)
+            self._batch_succeeded(w3, task, calls, elapsed, time.time() - call_start - elapsed)
+            start = end
+
+    def submit(self, call: W3Multicall.Call, block_identifier: Any = None, priority: int = W3MulticallBatcher.PRIORITY_NORMAL, deadline: Union[float, None] = None) -> Future:
         """
         Submit a W3Multicall.Call for execution
         :param call: call to execute
+        :param block_identifier: (optional) block number, hash or tag of the call (default 'latest')
+        :param priority: (default PRIORITY_NORMAL) batching lane of the call. Lower values are executed first (PRIORITY_HIGH lane is flushed immediately by default)
+        :param deadline: (optional) time.time() after which the call is not sent anymore (its Future raises concurrent.futures.TimeoutError)
         :return: Future instance. Use Future.get() to wait until the call is executed
         """
         with self.lock:
-            if self.pending_task is None:
-                self.pending_task = W3MulticallExecutor.Task()
-            call_key = len(self.pending_task.w3_calls)
-            self.pending_task.w3_calls[call_key] = call
-            task = self.pending_task
-            self.__check_pending_task()
-            return W3MulticallExecutor.Future(task, call_key)
+            if self.shutdown_requested:
+                raise Exception("Executor is shut down")
+            cached = self._get_cached(call, block_identifier)
+            if cached is not None:
+                return self.__cached_future(call, cached)
+            dedup_key, slot = self._join_inflight(call, block_identifier, priority)
+            if slot is not None:
+                task, call_key = slot
+                future = W3MulticallExecutor.Future(task, call_key, deadline)
+                task.w3_futures[call_key].append(future)
+                return future
+            future = W3MulticallExecutor.Future(None, None, deadline)
+            future.task, future.call_key = self._add_call(call, block_identifier, priority, deadline, dedup_key, future)
+            future.task.last_submit_time = time.time()
+            self.condition.notify()  # the flusher may need to wake up earlier
+            self.__check_pending_task(future.task)
+            return future
+
+    def submit_batch(self, calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], block_identifier: Any = None, priority: int = W3MulticallBatcher.PRIORITY_NORMAL,
+                     deadline: Union[float, None] = None) -> Union[List[Future], Future]:
+        """
+        Submit several calls at once. A CallBatch is sent as slices of batch_max_size calls, without deduplication (see W3MulticallBatcher._call_batch_tasks())
+        :param calls: list of W3Multicall.Call or W3Multicall.CallBatch
+        :param block_identifier: (optional) block number, hash or tag of the calls (default 'latest')
+        :param priority: (default PRIORITY_NORMAL) see submit()
+        :param deadline: (optional) see submit()
+        :return: Future of each call, or a single Future of the W3Multicall.LazyResults of the whole CallBatch
+        """
+        with self.lock:
+            if not isinstance(calls, W3Multicall.CallBatch):
+                return [self.submit(call, block_identifier, priority, deadline) for call in calls]
+            if self.shutdown_requested:
+                raise Exception("Executor is shut down")
+            tasks = self._call_batch_tasks(calls, block_identifier, priority, deadline)
+            future = W3MulticallExecutor.Future(tasks[0] if tasks else None, 0, deadline)
+            if not tasks:
+                future.set_result(W3Multicall.LazyResults(calls, None, []))
+            for task in tasks:
+                task.w3_futures[0] = [future]
+                self._trigger_pending_task(task)
+            return future
 
     def cancel_pending(self):
+        """
+        Cancel the Futures of the calls not yet sent
+        """
         with self.lock:
-            self.pending_task = None
+            for task in self.pending_tasks.values():
+                self._release(task)
+                for futures in task.w3_futures.values():
+                    for future in futures:
+                        if not future.done():
+                            future.cancel()
+            self.pending_tasks = {}
+            if self.metrics is not None:
+                self.metrics.set('executor_pending_tasks', 0)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Send the pending task and stop accepting calls
+        :param wait: (default True) wait until all the tasks are completed (threads of a W3MulticallRouter are stopped by W3MulticallRouter.shutdown())
+        """
+        with self.condition:
+            if self.shutdown_requested:
+                return
+            for task in list(self.pending_tasks.values()):
+                self._trigger_pending_task(task)
+            self.shutdown_requested = True
+            self.condition.notify_all()
+        if self.router is not None:
+            return
+        self.thread_pool.close()
+        if wait:
+            self.flusher.join()
+            self.thread_pool.join()
@@ -0,0 +1,174 @@
+from typing import List, Dict, Union, Any, Hashable
+import collections
+import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from ..multicall import W3Multicall
+from ..w3.w3 import W3Pool
+from .w3multicall_executor import W3MulticallExecutor
+
+
+class W3MulticallRouter:
+    """
+    Route calls of several chains (or multicall contracts) to per-chain W3MulticallExecutor sharing a single flusher thread and worker pool.
+    Ready batches are scheduled by priority, then round robin across chains, within a per-chain concurrency limit
+    """
+
+    class Chain:
+        def __init__(self, key: Hashable, executor: W3MulticallExecutor, max_concurrency: int):
+            self.key = key
+            self.executor = executor
+            self.max_concurrency = max_concurrency
+            self.running = 0
+
+        def __repr__(self):
+            return "{}|{}/{}".format(self.key, self.running, self.max_concurrency)
+
+        def is_ready(self) -> bool:
+            return self.running < self.max_concurrency and len(self.executor.ready_tasks) > 0
+
+    def __init__(self, processes: int, logger: Union[logging.Logger, None] = None):
+        """
+        :param processes: number of thread processing the W3Multicall of all the chains
+        :param logger: (optional) logging.Logger
+        """
+        self.processes = processes
+        self.logger = logger
+        self.chains: Dict[Hashable, W3MulticallRouter.Chain] = {}
+        self.rotation = collections.deque()  # chain keys in round robin order
+        self.lock = threading.RLock()
+        self.condition = threading.Condition(self.lock)
+        self.shutdown_requested = False
+
+        def thread_pool_initializer():
+            t = threading.current_thread()
+            t.name = 'W3MulticallRouter-{}'.format(t.name)
+
+        self.thread_pool = ThreadPool(processes=processes, initializer=thread_pool_initializer)
+        self.flusher = threading.Thread(target=self.__loop, name='W3MulticallRouter-flusher', daemon=True)
+        self.flusher.start()
+
+    def __enter__(self) -> 'W3MulticallRouter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def add_chain(self, key: Hashable, w3_pool: W3Pool, multicall_contract_address='0xcA11bde05977b3631167028862bE2a173976CA11', max_concurrency: Union[int, None] = None,
+                  **kwargs) -> W3MulticallExecutor:
+        """
+        Register a chain
+        :param key: chain key used by submit() (Example: chain id, or (chain id, multicall address))
+        :param w3_pool: W3Pool of the chain
+        :param multicall_contract_address: (optional) address of the multicall3.sol contract on the chain
+        :param max_concurrency: (default processes) max W3Multicall of the chain in flight
+        :param kwargs: W3MulticallExecutor options (batch_max_size, linger, cache, metrics...). chain_id defaults to key
+        :return: W3MulticallExecutor of the chain
+        """
+        with self.lock:
+            if self.shutdown_requested:
+                raise Exception("Router is shut down")
+            if key in self.chains:
+                raise Exception("Chain {} already registered".format(key))
+            kwargs.setdefault('chain_id', key)
+            kwargs.setdefault('logger', self.logger)
+            max_concurrency = self.processes if max_concurrency is None else max_concurrency
+            executor = W3MulticallExecutor(w3_pool, max_concurrency, multicall_contract_address, router=self, **kwargs)
+            self.chains[key] = W3MulticallRouter.Chain(key, executor, max_concurrency)
+            self.rotation.append(key)
+            return executor
+
+    def executor(self, key: Hashable) -> W3MulticallExecutor:
+        chain = self.chains.get(key)
+        if chain is None:
+            raise Exception("Unknown chain {}".format(key))
+        return chain.executor
+
+    def __loop(self):
+        """
+        Sleep until the earliest deadline of the pending tasks of all the chains and trigger the due ones
+        """
+        with self.condition:
+            while not self.shutdown_requested:
+                deadlines = [deadline for deadline in (chain.executor.flush_due() for chain in self.chains.values()) if deadline is not None]
+                self.condition.wait(min(deadlines) - time.time() if deadlines else None)
+
+    def dispatch(self):
+        """
+        Wake a worker thread (called by the executors when a task is triggered)
+        """
+        self.thread_pool.apply_async(func=self.__work)
+
+    def __next_chain(self) -> Union['W3MulticallRouter.Chain', None]:
+        """
+        :return: ready chain with the highest priority task, the first in round robin order among equals
+        """
+        best = None
+        for key in self.rotation:
+            chain = self.chains[key]
+            if chain.is_ready() and (best is None or chain.executor.ready_tasks[0][0] < best.executor.ready_tasks[0][0]):
+                best = chain
+        if best is not None:
+            self.rotation.remove(best.key)
+            self.rotation.append(best.key)
+            best.running += 1
+        return best
+
+    def __work(self):
+        while True:
+            with self.lock:
+                chain = self.__next_chain()
+            if chain is None:
+                return
+            try:
+                chain.executor.execute_ready()
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.error("Chain {} failed to execute a task: {}".format(chain.key, e))
+            finally:
+                with self.lock:
+                    chain.running -= 1
+
+    def submit(self, key: Hashable, call: W3Multicall.Call, block_identifier: Any = None, priority: int = W3MulticallExecutor.PRIORITY_NORMAL,
+               deadline: Union[float, None] = None) -> W3MulticallExecutor.Future:
+        """
+        Submit a W3Multicall.Call for execution on a chain
+        :param key: chain key (see add_chain())
+        :param call: call to execute
+        :param block_identifier: (optional) see W3MulticallExecutor.submit()
+        :param priority: (default PRIORITY_NORMAL) see W3MulticallExecutor.submit()
+        :param deadline: (optional) see W3MulticallExecutor.submit()
+        :return: W3MulticallExecutor.Future
+        """
+        return self.executor(key).submit(call, block_identifier, priority, deadline)
+
+    def submit_batch(self, key: Hashable, calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], block_identifier: Any = None,
+                     priority: int = W3MulticallExecutor.PRIORITY_NORMAL, deadline: Union[float, None] = None) -> List[W3MulticallExecutor.Future]:
+        """
+        Submit several calls at once on a chain (see W3MulticallExecutor.submit_batch())
+        """
+        return self.executor(key).submit_batch(calls, block_identifier, priority, deadline)
+
+    def cancel_pending(self):
+        with self.lock:
+            for chain in self.chains.values():
+                chain.executor.cancel_pending()
+
+    def shutdown(self, wait: bool = True):
+        """
+        Send the pending tasks of all the chains and stop accepting calls
+        :param wait: (default True) wait until all the tasks are completed
+        """
+        with self.condition:
+            if self.shutdown_requested:
+                return
+            for chain in self.chains.values():
+                chain.executor.shutdown()
+            self.shutdown_requested = True
+            self.condition.notify_all()
+        self.thread_pool.close()
+        if wait:
+            self.flusher.join()
+            self.thread_pool.join()
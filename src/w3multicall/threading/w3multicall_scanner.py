@@ -0,0 +1,158 @@
+from typing import List, Union, Iterator, Tuple, Optional, Any
+import collections
+import hashlib
+import logging
+import sqlite3
+import threading
+from multiprocessing.pool import ThreadPool
+
+from ..multicall import W3Multicall, encode, _decode_try_aggregate_output
+from ..w3.w3 import W3, W3Pool
+from ..batching import _is_transport_error
+
+
+class W3MulticallCheckpoint:
+    """
+    SQLite store of the raw results of completed blocks, allowing an interrupted W3MulticallScanner to resume
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of the SQLite database (created if missing)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS checkpoints (scan_id TEXT NOT NULL, block INTEGER NOT NULL, results BLOB NOT NULL, PRIMARY KEY (scan_id, block))")
+        self.connection.commit()
+
+    def __repr__(self):
+        return "W3MulticallCheckpoint({})".format(self.path)
+
+    def get(self, scan_id: str, block: int) -> Optional[Tuple[Tuple[bool, memoryview], ...]]:
+        """
+        :return: (success, return data) of each call at block or None if the block was not checkpointed
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT results FROM checkpoints WHERE scan_id = ? AND block = ?", (scan_id, block)).fetchone()
+        return None if row is None else _decode_try_aggregate_output(row[0])
+
+    def put(self, scan_id: str, block: int, results: 'W3Multicall.LazyResults'):
+        payload = encode(['(bool,bytes)[]'], [[(success, bytes(output)) for success, output in zip(results.successes, results.return_data)]])
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO checkpoints (scan_id, block, results) VALUES (?, ?, ?)", (scan_id, block, payload))
+            self.connection.commit()
+
+    def blocks(self, scan_id: str) -> List[int]:
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT block FROM checkpoints WHERE scan_id = ? ORDER BY block", (scan_id,))]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class W3MulticallScanner:
+    """
+    Evaluate the same calls across a range of blocks in parallel, yielding the results in block order
+    """
+
+    def __init__(self, w3_pool: W3Pool, processes: int, multicall_contract_address='0xcA11bde05977b3631167028862bE2a173976CA11', require_success: bool = True, method: str = W3Multicall.AGGREGATE,
+                 checkpoint: Union[W3MulticallCheckpoint, None] = None, max_pending: Union[int, None] = None, retries: int = 3, logger: Union[logging.Logger, None] = None):
+        """
+        :param w3_pool: W3Pool
+        :param processes: number of thread querying blocks
+        :param multicall_contract_address: (optional) address of the multicall3.sol contract
+        :param require_success: (default True) see W3Multicall
+        :param method: (default 'aggregate') multicall3 method (see W3Multicall)
+        :param checkpoint: (optional) W3MulticallCheckpoint storing completed blocks
+        :param max_pending: (default 2 * processes) max blocks queried ahead of the consumer (backpressure)
+        :param retries: (default 3) attempts per block before the scan fails
+        :param logger: (optional) logging.Logger
+        """
+        self.w3_pool = w3_pool
+        self.processes = processes
+        self.multicall_contract_address = multicall_contract_address
+        self.require_success = require_success
+        self.method = method
+        self.checkpoint = checkpoint
+        self.max_pending = 2 * processes if max_pending is None else max_pending
+        self.retries = retries
+        self.logger = logger
+
+        def thread_pool_initializer():
+            t = threading.current_thread()
+            t.name = 'W3MulticallScanner-{}'.format(t.name)
+
+        self.thread_pool = ThreadPool(processes=processes, initializer=thread_pool_initializer)
+
+    def __enter__(self) -> 'W3MulticallScanner':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def scan_id(self, calls: List[W3Multicall.Call]) -> str:
+        """
+        :return: identifier of the checkpoints of a call set
+        """
+        digest = hashlib.sha256('{}|{}|{}'.format(self.multicall_contract_address.lower(), self.method, self.require_success).encode())
+        for call in calls:
+            digest.update(call.address.lower().encode())
+            digest.update(call.data)
+            digest.update(call.signature.encode())
+        return digest.hexdigest()
+
+    def __query(self, scan_id: str, calls: List[W3Multicall.Call], block: int) -> 'W3Multicall.LazyResults':
+        def multicall(w3: W3):
+            return W3Multicall(w3.web3, self.multicall_contract_address, calls, require_success=self.require_success, method=self.method).call(lazy=True, block_identifier=block)
+
+        for attempt in range(self.retries):
+            try:
+                results = self.w3_pool.run(multicall, is_provider_error=_is_transport_error)  # reverts and unknown blocks are not provider failures
+                if self.checkpoint is not None:
+                    self.checkpoint.put(scan_id, block, results)
+                return results
+            except Exception as e:
+                if attempt + 1 >= self.retries:
+                    raise
+                if self.logger is not None:
+                    self.logger.warning("Block {} failed ({}), retrying".format(block, e))
+
+    def scan(self, calls: List[W3Multicall.Call], start_block: int, end_block: int, step: int = 1, lazy: bool = False) -> Iterator[Tuple[int, Any]]:
+        """
+        Query calls at each block of [start_block, end_block]. At most max_pending blocks are queried ahead of the consumer
+        :param calls: list of W3Multicall.Call
+        :param start_block: first block
+        :param end_block: last block (included)
+        :param step: (default 1) block step
+        :param lazy: (default False) yield W3Multicall.LazyResults instead of decoded lists
+        :return: generator of (block, results) in block order
+        """
+        scan_id = self.scan_id(calls)
+        blocks = iter(range(start_block, end_block + 1, step))
+        pending = collections.deque()
+
+        def schedule():
+            for block in blocks:
+                checkpointed = None if self.checkpoint is None else self.checkpoint.get(scan_id, block)
+                if checkpointed is not None:
+                    pending.append((block, None, W3Multicall.LazyResults(calls, block, checkpointed)))
+                else:
+                    pending.append((block, self.thread_pool.apply_async(self.__query, (scan_id, calls, block)), None))
+                if len(pending) >= self.max_pending:
+                    return
+
+        schedule()
+        while pending:
+            block, async_result, results = pending.popleft()
+            if results is None:
+                results = async_result.get()
+            schedule()
+            yield block, results if lazy else list(results)
+
+    def close(self):
+        self.thread_pool.close()
+        self.thread_pool.join()
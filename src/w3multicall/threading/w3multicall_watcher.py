@@ -0,0 +1,198 @@
+from typing import List, Dict, Union, Iterator, Tuple, Any
+import collections
+import logging
+import threading
+import time
+
+from ..multicall import W3Multicall
+from ..w3.w3 import W3, W3Pool
+from ..batching import _is_transport_error
+
+
+def _block_hash_hex(block_hash: Union[bytes, str]) -> str:
+    return block_hash.lower() if isinstance(block_hash, str) else '0x' + bytes(block_hash).hex()
+
+
+class W3MulticallWatcher:
+    """
+    Follow new heads and evaluate the same calls once per block, emitting only the results whose raw return data changed.
+    Results are queried at the block hash and reorgs are detected from the parent hashes. Blocks mined between two polls are processed in order, up to max_catch_up blocks
+    """
+
+    class Change:
+        def __init__(self, index: int, call: W3Multicall.Call, success: bool, value: Any, previous_success: Union[bool, None], previous: Any):
+            self.index = index
+            self.call = call
+            self.success = success
+            self.value = value
+            self.previous_success = previous_success
+            self.previous = previous
+
+        def __repr__(self):
+            return "{}: {} -> {}".format(self.call, self.previous, self.value)
+
+    class Update:
+        def __init__(self, block_number: int, block_hash: str, parent_hash: str, changes: List['W3MulticallWatcher.Change'], results: 'W3Multicall.LazyResults',
+                     removed: List[str]):
+            """
+            :param removed: hashes of the blocks orphaned by a reorg (empty if the head extends the previous one)
+            """
+            self.block_number = block_number
+            self.block_hash = block_hash
+            self.parent_hash = parent_hash
+            self.changes = changes
+            self.results = results
+            self.removed = removed
+
+        def __repr__(self):
+            return "{}|{}|{} changes{}".format(self.block_number, self.block_hash, len(self.changes), '|reorg of {} blocks'.format(len(self.removed)) if self.removed else '')
+
+        @property
+        def reorg(self) -> bool:
+            return len(self.removed) > 0
+
+    def __init__(self, w3_pool: W3Pool, calls: Union[List[W3Multicall.Call], W3Multicall.CallBatch], multicall_contract_address='0xcA11bde05977b3631167028862bE2a173976CA11',
+                 require_success: bool = False, method: str = W3Multicall.AGGREGATE3, poll_interval: float = 1.0, max_reorg_depth: int = 64, max_catch_up: int = 64,
+                 logger: Union[logging.Logger, None] = None):
+        """
+        :param w3_pool: W3Pool. Its web3 must expose eth.get_block() (Web3 or W3HTTPTransport)
+        :param calls: list of W3Multicall.Call or W3Multicall.CallBatch
+        :param multicall_contract_address: (optional) address of the multicall3.sol contract
+        :param require_success: (default False) see W3Multicall
+        :param method: (default 'aggregate3') multicall3 method (see W3Multicall)
+        :param poll_interval: (default 1.0) seconds between two polls of the head in watch()
+        :param max_reorg_depth: (default 64) number of canonical block hashes kept to find the common ancestor of a reorg
+        :param max_catch_up: (default 64) max blocks processed by a poll. When the head moved further, the older blocks are skipped
+        :param logger: (optional) logging.Logger
+        """
+        self.w3_pool = w3_pool
+        self.calls = calls
+        self.multicall_contract_address = multicall_contract_address
+        self.require_success = require_success
+        self.method = method
+        self.poll_interval = poll_interval
+        self.max_reorg_depth = max_reorg_depth
+        self.max_catch_up = max_catch_up
+        self.logger = logger
+        self.canonical: Dict[int, str] = collections.OrderedDict()  # block number -> hash of the processed chain
+        self.results: Union[W3Multicall.LazyResults, None] = None
+        self.head_hash: Union[str, None] = None
+        self.head_number: Union[int, None] = None
+        self.stop_event = threading.Event()
+
+    def __repr__(self):
+        return "W3MulticallWatcher({} calls, head={})".format(len(self.calls), self.head_hash)
+
+    def __get_block(self, block_identifier: Any) -> dict:
+        return self.w3_pool.run(lambda w3: w3.web3.eth.get_block(block_identifier), is_provider_error=_is_transport_error)
+
+    def __query(self, block_hash: str) -> 'W3Multicall.LazyResults':
+        def multicall(w3: W3):
+            return W3Multicall(w3.web3, self.multicall_contract_address, self.calls, require_success=self.require_success, method=self.method).call(lazy=True, block_identifier=block_hash)
+        return self.w3_pool.run(multicall, is_provider_error=_is_transport_error)
+
+    def __orphaned(self, head: dict) -> List[str]:
+        """
+        Walk back the parent hashes of a new head until a block of the processed chain
+        :return: hashes of the processed blocks not ancestors of head
+        """
+        known = {block_hash: number for number, block_hash in self.canonical.items()}
+        parent_hash = _block_hash_hex(head['parentHash'])
+        depth = 0
+        while parent_hash not in known:
+            depth += 1
+            if depth > self.max_reorg_depth or parent_hash == _block_hash_hex(bytes(32)):
+                if self.logger is not None:
+                    self.logger.warning("No common ancestor within {} blocks of {}".format(self.max_reorg_depth, head['number']))
+                return list(self.canonical.values())
+            parent_hash = _block_hash_hex(self.__get_block(parent_hash)['parentHash'])
+        ancestor = known[parent_hash]
+        return [block_hash for number, block_hash in self.canonical.items() if number > ancestor]
+
+    def __new_blocks(self, head: dict) -> Tuple[List[dict], bool]:
+        """
+        Walk back the parent hashes of head down to a block of the processed chain
+        :return: blocks to process in ascending order (head last, at most max_catch_up) and whether older blocks were skipped
+        """
+        blocks = [head]
+        if self.head_hash is None:
+            return blocks, False
+        known = set(self.canonical.values())
+        while _block_hash_hex(blocks[0]['parentHash']) not in known and blocks[0]['number'] > 0 and len(blocks) < self.max_catch_up:
+            blocks.insert(0, self.__get_block(_block_hash_hex(blocks[0]['parentHash'])))
+        skipped = _block_hash_hex(blocks[0]['parentHash']) not in known and blocks[0]['number'] > self.head_number + 1
+        if skipped and self.logger is not None:
+            self.logger.warning("Watcher more than {} blocks behind: blocks {} to {} skipped".format(self.max_catch_up, self.head_number + 1, blocks[0]['number'] - 1))
+        return blocks, skipped
+
+    def __process(self, block: dict, skipped: bool) -> 'W3MulticallWatcher.Update':
+        """
+        :param skipped: blocks between the processed head and block were skipped
+        """
+        block_hash = _block_hash_hex(block['hash'])
+        results = self.__query(block_hash)
+        if self.head_hash is None:
+            removed = []
+        elif skipped and _block_hash_hex(self.__get_block(self.head_number)['hash']) == self.head_hash:
+            removed = []  # the processed head is still canonical below the skipped blocks
+        else:
+            removed = self.__orphaned(block)
+        if removed and self.logger is not None:
+            self.logger.warning("Reorg at block {}: {} blocks removed".format(block['number'], len(removed)))
+
+        previous = self.results
+        changes = []
+        for i in range(len(results)):
+            if previous is not None and previous.successes[i] == results.successes[i] and previous.return_data[i] == results.return_data[i]:
+                continue
+            changes.append(W3MulticallWatcher.Change(i, self.calls[i], results.successes[i], results[i] if results.successes[i] else None,
+                                                     None if previous is None else previous.successes[i],
+                                                     previous[i] if previous is not None and previous.successes[i] else None))
+
+        for number in [number for number, known in self.canonical.items() if known in removed or number >= block['number']]:
+            del self.canonical[number]
+        self.canonical[block['number']] = block_hash
+        while len(self.canonical) > self.max_reorg_depth:
+            self.canonical.popitem(last=False)
+        self.results = results
+        self.head_hash = block_hash
+        self.head_number = block['number']
+        return W3MulticallWatcher.Update(block['number'], block_hash, _block_hash_hex(block['parentHash']), changes, results, removed)
+
+    def __updates(self) -> Iterator['W3MulticallWatcher.Update']:
+        head = self.__get_block('latest')
+        if _block_hash_hex(head['hash']) == self.head_hash:
+            return
+        blocks, skipped = self.__new_blocks(head)
+        for i, block in enumerate(blocks):
+            yield self.__process(block, skipped and i == 0)
+
+    def poll(self) -> List['W3MulticallWatcher.Update']:
+        """
+        Query the calls at each block mined since the previous poll (see max_catch_up)
+        :return: Update of each new block, in order, holding the calls whose raw result changed since the previous block (all the calls at the first poll).
+                 Empty if the head did not change
+        """
+        return list(self.__updates())
+
+    def watch(self, emit_empty: bool = False) -> Iterator['W3MulticallWatcher.Update']:
+        """
+        Poll the head every poll_interval seconds until stop() is called. A failing poll is logged (if a logger is set) and retried at the next interval,
+        from the last block emitted
+        :param emit_empty: (default False) also yield the Update of new blocks without changes
+        :return: generator of Update
+        """
+        self.stop_event.clear()
+        while not self.stop_event.is_set():
+            start = time.time()
+            try:
+                for update in self.__updates():
+                    if update.changes or update.removed or emit_empty:
+                        yield update
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.warning("Watcher poll failed: {}".format(e))
+            self.stop_event.wait(max(0.0, self.poll_interval - (time.time() - start)))
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,114 @@
+from typing import List, Union, Any, Tuple, Dict, Optional
+import json
+import itertools
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .json_rpc import _block_to_json, _decode_result, decode_batch_eth_call
+
+
+class W3HTTPTransport:
+    """
+    Minimal eth_call JSON-RPC client over a keep-alive HTTP connection pool. Can replace the Web3 instance of W3Multicall and W3
+    (exposes eth.call) without going through the web3 request manager, middlewares and formatters. Does not import web3
+    """
+
+    class Eth:
+        def __init__(self, transport: 'W3HTTPTransport'):
+            self.transport = transport
+
+        def call(self, params: dict, block_identifier: Any = None) -> bytes:
+            return self.transport.call(params, block_identifier)
+
+        def get_block(self, block_identifier: Any = 'latest') -> dict:
+            return self.transport.get_block(block_identifier)
+
+    def __init__(self, endpoint_uri: str, timeout: float = 10, pool_maxsize: int = 10, headers: Optional[Dict[str, str]] = None):
+        """
+        :param endpoint_uri: HTTP(S) JSON-RPC endpoint
+        :param timeout: (default 10) request timeout in seconds
+        :param pool_maxsize: (default 10) max kept-alive connections to the endpoint (set to the number of threads using the transport)
+        :param headers: (optional) extra HTTP headers
+        """
+        self.endpoint_uri = endpoint_uri
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize))
+        self.session.headers.update({'Content-Type': 'application/json'})
+        if headers is not None:
+            self.session.headers.update(headers)
+        self.ids = itertools.count()
+        self.ids_lock = threading.Lock()
+        self.eth = W3HTTPTransport.Eth(self)
+
+    def __repr__(self):
+        return "W3HTTPTransport({})".format(self.endpoint_uri)
+
+    def __enter__(self) -> 'W3HTTPTransport':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __next_id(self) -> int:
+        with self.ids_lock:
+            return next(self.ids)
+
+    @staticmethod
+    def encode_eth_call(request_id: int, params: dict, block_identifier: Any = None) -> str:
+        """
+        :return: serialized eth_call JSON-RPC request (calldata hex encoded once)
+        """
+        data = params['data']
+        return '{{"jsonrpc":"2.0","id":{},"method":"eth_call","params":[{{"to":"{}","data":"{}"}},"{}"]}}'.format(
+            request_id, params['to'], data if isinstance(data, str) else '0x' + data.hex(), _block_to_json(block_identifier))
+
+    def post(self, body: Union[bytes, str]) -> bytes:
+        """
+        :return: raw JSON-RPC response body
+        """
+        response = self.session.post(self.endpoint_uri, data=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def call(self, params: dict, block_identifier: Any = None) -> bytes:
+        """
+        :param params: eth_call parameters ('to' and 'data')
+        :param block_identifier: (optional) block number, hash or tag (default 'latest')
+        :return: return data
+        """
+        return _decode_result(json.loads(self.post(W3HTTPTransport.encode_eth_call(self.__next_id(), params, block_identifier))))
+
+    def get_block(self, block_identifier: Any = 'latest') -> dict:
+        """
+        :param block_identifier: (default 'latest') block number, hash or tag
+        :return: block header with 'number' (int), 'hash' and 'parentHash' (bytes), without transactions
+        """
+        block = _block_to_json(block_identifier)
+        method = 'eth_getBlockByHash' if len(block) == 66 else 'eth_getBlockByNumber'
+        body = '{{"jsonrpc":"2.0","id":{},"method":"{}","params":["{}",false]}}'.format(self.__next_id(), method, block)
+        response = json.loads(self.post(body))
+        if response.get('error') is not None:
+            _decode_result(response)
+        header = response.get('result')
+        if header is None:
+            raise Exception("Block {} not found".format(block))
+        header = dict(header)
+        header['number'] = int(header['number'], 16)
+        for k in ('hash', 'parentHash'):
+            header[k] = bytes.fromhex(header[k][2:])
+        return header
+
+    def batch_call(self, eth_calls: List[Tuple[dict, Any]]) -> List[Union[bytes, Exception]]:
+        """
+        :param eth_calls: list of (eth_call params, block identifier)
+        :return: return data or exception of each eth_call, in order
+        """
+        body = '[' + ','.join(W3HTTPTransport.encode_eth_call(i, params, block_identifier) for i, (params, block_identifier) in enumerate(eth_calls)) + ']'
+        return decode_batch_eth_call(self.post(body), len(eth_calls))
+
+    def close(self):
+        self.session.close()
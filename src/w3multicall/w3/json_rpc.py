@@ -0,0 +1,102 @@
+from typing import List, Union, Any, Tuple
+import json
+
+import requests
+from web3 import HTTPProvider
+
+DEFAULT_TIMEOUT = 10
+_session = requests.Session()  # keep-alive connections of the HTTPProvider batches
+
+
+class JsonRpcError(Exception):
+    """
+    Error answered to a JSON-RPC request
+    """
+
+    def __init__(self, message: str, code: Union[int, None] = None):
+        super().__init__(message)
+        self.code = code
+
+
+def _block_to_json(block_identifier: Any) -> str:
+    if block_identifier is None:
+        return 'latest'
+    if isinstance(block_identifier, int):
+        return hex(block_identifier)
+    if isinstance(block_identifier, (bytes, bytearray)):
+        return '0x' + bytes(block_identifier).hex()
+    return block_identifier
+
+
+def _data_to_json(data: Union[bytes, str]) -> str:
+    return data if isinstance(data, str) else '0x' + data.hex()
+
+
+def _decode_result(response: dict) -> bytes:
+    if response.get('error') is not None:
+        error = response['error']
+        if isinstance(error, dict):
+            raise JsonRpcError(error.get('message', error), error.get('code'))
+        raise JsonRpcError(error)
+    result = response.get('result') or '0x'
+    return bytes.fromhex(result[2:] if result.startswith('0x') else result)
+
+
+def encode_batch_eth_call(eth_calls: List[Tuple[dict, Any]]) -> bytes:
+    """
+    :param eth_calls: list of (eth_call params, block identifier)
+    :return: JSON-RPC batch request body
+    """
+    return json.dumps([
+        {'jsonrpc': '2.0', 'id': i, 'method': 'eth_call', 'params': [{'to': params['to'], 'data': _data_to_json(params['data'])}, _block_to_json(block_identifier)]}
+        for i, (params, block_identifier) in enumerate(eth_calls)
+    ]).encode()
+
+
+def decode_batch_eth_call(raw_response: Union[bytes, str], size: int) -> List[Union[bytes, Exception]]:
+    """
+    Demultiplex a JSON-RPC batch response (responses may come in any order)
+    :param raw_response: JSON-RPC batch response body
+    :param size: number of requests in the batch
+    :return: return data or exception of each request, in request order
+    """
+    response = json.loads(raw_response)
+    if not isinstance(response, list):
+        error = response.get('error', response) if isinstance(response, dict) else response
+        raise Exception("JSON-RPC batch rejected: {}".format(error))
+    results: List[Union[bytes, Exception]] = [Exception("No response in JSON-RPC batch")] * size
+    for item in response:
+        i = item.get('id')
+        if not isinstance(i, int) or not 0 <= i < size:
+            continue
+        try:
+            results[i] = _decode_result(item)
+        except Exception as e:
+            results[i] = e
+    return results
+
+
+def supports_batch_eth_call(web3) -> bool:
+    """
+    :return: True if batch_eth_call() can send through web3 (W3HTTPTransport or Web3 with an HTTPProvider)
+    """
+    return hasattr(web3, 'batch_call') or isinstance(getattr(web3, 'provider', None), HTTPProvider)
+
+
+def batch_eth_call(web3, eth_calls: List[Tuple[dict, Any]]) -> List[Union[bytes, Exception]]:
+    """
+    Send several eth_call in a single JSON-RPC batch HTTP request (bypass web3 middlewares)
+    :param web3: Web3 instance with an HTTPProvider or W3HTTPTransport
+    :param eth_calls: list of (eth_call params, block identifier)
+    :return: return data or exception of each eth_call, in order
+    """
+    if hasattr(web3, 'batch_call'):
+        return web3.batch_call(eth_calls)  # W3HTTPTransport
+    if not supports_batch_eth_call(web3):
+        raise Exception("JSON-RPC batch requires an HTTPProvider")
+    provider = web3.provider
+    request_kwargs = dict(provider.get_request_kwargs())
+    request_kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    response = _session.post(provider.endpoint_uri, data=encode_batch_eth_call(eth_calls), **request_kwargs)
+    response.raise_for_status()
+    return decode_batch_eth_call(response.content, len(eth_calls))
@@ -1,108 +1,500 @@
-from typing import List, Dict, Union, Callable
+from typing import List, Dict, Union, Callable, Tuple, Any, Awaitable
 import time
+import heapq
+import itertools
+import asyncio
 import logging
 import threading
+import collections
+import concurrent.futures
 from web3 import Web3
 
+from ..metrics import W3MulticallMetrics
+
 
 class W3:
 
-    def __init__(self, _web3: Web3, delay_between_call: float, label: Union[str, None] = None):
+    def __init__(self, _web3: Web3, delay_between_call: Union[float, None] = None, label: Union[str, None] = None, max_batch_size: Union[int, None] = None,
+                 rate: Union[float, None] = None, burst: float = 1, weights: Union[Dict[str, float], None] = None):
+        """
+        Web3 instance rate limited with a token bucket
+        :param _web3: Web3 instance
+        :param delay_between_call: minimum delay in seconds between 2 calls (ignored if rate is set)
+        :param label: (optional) label of the instance
+        :param max_batch_size: (optional) max call per multicall accepted by the provider. Learned by W3MulticallExecutor if None
+        :param rate: (optional) calls per second allowed by the provider (default 1 / delay_between_call)
+        :param burst: (default 1) max calls that can be done at once after the provider has been idle
+        :param weights: (optional) token cost per request type (ex: {'eth_getLogs': 5}). Default cost is 1
+        """
+        if rate is None and delay_between_call is None:
+            raise Exception("delay_between_call or rate required")
         self.web3 = _web3
-        self.delay_between_call = delay_between_call
-        self.limit_rate_per_seconds = 1 / self.delay_between_call
+        self.limit_rate_per_seconds = 1 / delay_between_call if rate is None else rate
+        self.delay_between_call = 1 / self.limit_rate_per_seconds
+        self.burst = max(burst, 1)
+        self.weights = {} if weights is None else weights
+        self.tokens = self.burst
+        self.updated_at = 0
         self.last_call_at = 0
         self.label = hex(id(self)) if label is None else label
+        self.max_batch_size = max_batch_size
+        self.latency: Union[float, None] = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.open_until = 0
 
     def __repr__(self):
         return '{} {:.2f}/s'.format(self.label, self.limit_rate_per_seconds)
 
-    def use(self) -> Web3:
-        self.last_call_at = time.time()
+    def weight(self, request_type: Union[str, None] = None) -> float:
+        return min(self.weights.get(request_type, 1), self.burst)
+
+    def use(self, request_type: Union[str, None] = None) -> Web3:
+        now = time.time()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.limit_rate_per_seconds) - self.weight(request_type)
+        self.updated_at = now
+        self.last_call_at = now
         return self.web3
 
-    def usable_at(self):
-        return self.last_call_at + self.delay_between_call
+    def usable_at(self, request_type: Union[str, None] = None):
+        """
+        :return: timestamp at which the bucket holds enough tokens for request_type. Does not change as time passes
+        """
+        return self.updated_at + max(0, self.weight(request_type) - self.tokens) / self.limit_rate_per_seconds
+
+    def usable_in(self, request_type: Union[str, None] = None):
+        return self.usable_at(request_type) - time.time()
+
+    def available_at(self, request_type: Union[str, None] = None):
+        """
+        :return: timestamp at which the instance is neither rate limited nor ejected by the circuit breaker
+        """
+        return max(self.usable_at(request_type), self.open_until)
+
+    def expected_latency(self) -> float:
+        """
+        :return: EWMA latency penalized by the error rate (expected completion time of a call scheduled while the instance is available)
+        """
+        return (0 if self.latency is None else self.latency) / max(1 - self.error_rate, 0.05)
 
-    def usable_in(self):
-        return self.usable_at() - time.time()
+    def expected_completion_at(self, now: float, request_type: Union[str, None] = None) -> float:
+        """
+        :return: expected timestamp of a successful answer if a call was scheduled now (waiting time + EWMA latency penalized by the error rate)
+        """
+        return (max(now, self.available_at(request_type)) - now) / max(1 - self.error_rate, 0.05) + self.expected_latency() + now
 
 
 class W3Pool:
     """
-    Pool of W3 instances
+    Pool of W3 instances. W3 instances are kept in a heap ordered by next available time
     """
 
-    def __init__(self, w3s: List[W3], logger: Union[logging.Logger, None] = None):
+    EWMA_ALPHA = 0.2
+    LATENCY_SAMPLES = 1000
+
+    def __init__(self, w3s: List[W3], logger: Union[logging.Logger, None] = None, latency_aware: bool = False, failure_threshold: int = 5, circuit_cooldown: float = 30,
+                 hedge_percentile: Union[float, None] = None, hedge_min_samples: int = 20, metrics: Union[W3MulticallMetrics, None] = None, hedge_max_workers: int = 64):
         """
         :param w3s: list of W3 instances
         :param logger: (optional) logging.Logger
+        :param latency_aware: (default False) pick the W3 with the lowest expected completion time (see W3.expected_completion_at) instead of the first available
+        :param failure_threshold: (default 5) consecutive failures ejecting a W3 (circuit breaker)
+        :param circuit_cooldown: (default 30) seconds before an ejected W3 is probed again
+        :param hedge_percentile: (optional) W3Pool.run() sends the call to a second W3 if no answer was received after this latency percentile (ex: 0.95)
+        :param hedge_min_samples: (default 20) latency samples required before hedging
+        :param metrics: (optional) W3MulticallMetrics recording slot wait time, latency and errors per W3
+        :param hedge_max_workers: (default 64) threads running hedgeable calls. When they are all busy, calls run in the caller thread without hedging (never queued)
         """
         self.w3s = w3s
         self.logger = logger
+        self.latency_aware = latency_aware
+        self.failure_threshold = failure_threshold
+        self.circuit_cooldown = circuit_cooldown
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.metrics = metrics
+        self.latencies = collections.deque(maxlen=W3Pool.LATENCY_SAMPLES)
+        self.hedge_max_workers = hedge_max_workers
+        self.hedge_slots = threading.BoundedSemaphore(hedge_max_workers)
+        self.hedge_executor: Union[concurrent.futures.ThreadPoolExecutor, None] = None
         self.lock = threading.RLock()
+        self.condition = threading.Condition(self.lock)
+        self.heap: List[Tuple[float, int, W3]] = []  # (available_at, version, w3)
+        self.ready_heap: List[Tuple[float, int, W3]] = []  # latency_aware only: (expected latency, version, w3) of the W3 available
+        self.versions = itertools.count()
+        self.heap_versions: Dict[int, int] = {}  # id(w3) -> version of its valid heap entry. Other entries are stale and skipped
+        for w3 in w3s:
+            self.__update(w3)
+
+    def __update(self, w3: W3):
+        """
+        O(log n) reschedule of w3 after its bucket, circuit or latency changed: a new heap entry is pushed and the previous one becomes stale
+        """
+        version = next(self.versions)
+        self.heap_versions[id(w3)] = version
+        available_at = w3.available_at()
+        if self.latency_aware and available_at <= time.time():
+            heapq.heappush(self.ready_heap, (w3.expected_latency(), version, w3))
+        else:
+            heapq.heappush(self.heap, (available_at, version, w3))
+        if len(self.heap) + len(self.ready_heap) > 2 * len(self.heap_versions) + 16:
+            self.__compact()
+
+    def __compact(self):
+        """
+        Drop the stale entries (amortized O(1) per update)
+        """
+        self.heap = [entry for entry in self.heap if self.__is_valid(entry)]
+        self.ready_heap = [entry for entry in self.ready_heap if self.__is_valid(entry)]
+        heapq.heapify(self.heap)
+        heapq.heapify(self.ready_heap)
+
+    def __is_valid(self, entry: Tuple[float, int, W3]) -> bool:
+        return self.heap_versions.get(id(entry[2])) == entry[1]
+
+    def __first(self, heap: List[Tuple[float, int, W3]], exclude: Union[W3, None] = None) -> Union[W3, None]:
+        """
+        :return: W3 of the first valid entry of heap that is not exclude
+        """
+        while heap and not self.__is_valid(heap[0]):
+            heapq.heappop(heap)
+        if not heap or heap[0][2] is not exclude:
+            return heap[0][2] if heap else None
+        top = heapq.heappop(heap)
+        w3 = self.__first(heap)
+        heapq.heappush(heap, top)
+        return w3
+
+    def __promote(self, now: float):
+        """
+        latency_aware: move the W3 available at now to the ready heap, ordered by expected latency
+        """
+        while self.heap and self.heap[0][0] <= now:
+            _, version, w3 = heapq.heappop(self.heap)
+            if self.heap_versions.get(id(w3)) == version:
+                heapq.heappush(self.ready_heap, (w3.expected_latency(), version, w3))
+
+    def __mark_used(self, w3: W3, request_type: Union[str, None]):
+        if self.logger is not None:
+            self.logger.debug("Using {}".format(w3))
+        w3.use(request_type)
+        if w3.failures >= self.failure_threshold and self.__can_eject(w3):
+            # half-open circuit: this call probes the W3, no other call is sent until it completes
+            w3.open_until = time.time() + self.circuit_cooldown
+
+    def __can_eject(self, w3: W3) -> bool:
+        """
+        :return: False if w3 is the last W3 not ejected (the pool never ejects all its W3)
+        """
+        now = time.time()
+        return any(other is not w3 and other.open_until <= now for other in self.w3s)
 
     def add_w3(self, w3: W3) -> 'W3Pool':
-        self.w3s.append(w3)
+        with self.condition:
+            self.w3s.append(w3)
+            self.__update(w3)
+            self.condition.notify_all()
         return self
 
-    def use_specific(self, w3_target: Union[W3, str], block: bool = True):
-        while True:
-            target = None
-            with self.lock:
-                for i in range(len(self.w3s)):
-                    if self.w3s[i] == w3_target or self.w3s[i].label == w3_target:
-                        tau = self.w3s[i].usable_in()
-                        if tau <= 0:
-                            if self.logger is not None:
-                                self.logger.debug("Using {}".format(self.w3s[i]))
-                            return self.w3s[i].use()
-                        target = self.w3s[i]
-                        break
-
-            if target is None:
-                raise Exception("Target w3 '{}' not found".format(w3_target))
-            if block:
-                sleep = target.usable_in()
-                if sleep > 0:
-                    if self.logger is not None:
-                        self.logger.warning("Waiting {}s for {}".format(sleep, target))
-                    time.sleep(sleep)
+    def use_specific(self, w3_target: Union[W3, str], block: bool = True, request_type: Union[str, None] = None):
+        start = time.time()
+        with self.condition:
+            while True:
+                target, sleep = self._try_acquire_specific(w3_target, request_type)
+                if sleep <= 0:
+                    self._observe_wait(target, start, request_type)
+                    return target.web3
+                if not block:
+                    return None
+                if self.logger is not None:
+                    self.logger.warning("Waiting {}s for {}".format(sleep, target))
+                self.condition.wait(sleep)
 
-    def use(self, block: bool = True) -> Union[Web3, None]:
+    def use(self, block: bool = True, request_type: Union[str, None] = None) -> Union[Web3, None]:
         """
         Return a Web3 instance that will not hit the rate limit upon calling (may block until the rate limit windows has passed)
         :param block: (default: true) block until a Web3 instance is available
+        :param request_type: (optional) request type used to weight the call (see W3.weights)
         :return: Web3 instance
         """
+        w3 = self.acquire(block, request_type)
+        return None if w3 is None else w3.web3
 
-        next_available: Union[W3, None] = None
+    def acquire(self, block: bool = True, request_type: Union[str, None] = None, exclude: Union[W3, None] = None) -> Union[W3, None]:
+        """
+        Same as W3Pool.use() but return the W3 instance
+        :param block: (default: true) block until a W3 instance is available
+        :param request_type: (optional) request type used to weight the call (see W3.weights)
+        :param exclude: (optional) W3 instance not to return
+        :return: W3 instance
+        """
+        start = time.time()
+        with self.condition:
+            while True:
+                w3, sleep = self._try_acquire(request_type, exclude)
+                if w3 is not None:
+                    self._observe_wait(w3, start, request_type)
+                    return w3
+                if not block:
+                    return None
+                if self.logger is not None:
+                    self.logger.warning("Waiting {}s for a slot".format(sleep))
+                self.condition.wait(sleep)
 
-        while next_available is None:
-            sleep = 0
-            with self.lock:
-                for i in range(len(self.w3s)):
-                    tau = self.w3s[i].usable_in()
+    def _try_acquire(self, request_type: Union[str, None] = None, exclude: Union[W3, None] = None) -> Tuple[Union[W3, None], float]:
+        """
+        O(log n) slot acquisition. If latency_aware, the W3 with the lowest expected completion time among the available W3 with the lowest expected latency
+        and the first W3 to become available
+        :return: the W3 instance marked as used (or None if all are rate limited) and the delay until the next one is usable
+        """
+        with self.lock:
+            if len(self.w3s) == 0 or (len(self.w3s) == 1 and self.w3s[0] is exclude):
+                raise Exception("No Web3 instance found")
+            now = time.time()
+            if self.latency_aware:
+                self.__promote(now)
+                candidates = [w3 for w3 in (self.__first(self.ready_heap, exclude), self.__first(self.heap, exclude)) if w3 is not None]
+                w3 = min(candidates, key=lambda candidate: candidate.expected_completion_at(now, request_type))
+            else:
+                w3 = self.__first(self.heap, exclude)
+            sleep = w3.available_at(request_type) - now
+            if sleep > 0:
+                return None, sleep
+            self.__mark_used(w3, request_type)
+            self.__update(w3)
+            return w3, 0
+
+    def _try_acquire_specific(self, w3_target: Union[W3, str], request_type: Union[str, None] = None) -> Tuple[W3, float]:
+        """
+        :return: the target W3 instance and the delay until it is usable (marked as used if the delay is 0)
+        """
+        with self.lock:
+            for w3 in self.w3s:
+                if w3 == w3_target or w3.label == w3_target:
+                    tau = w3.usable_in(request_type)
                     if tau <= 0:
-                        if self.logger is not None:
-                            self.logger.debug("Using {}".format(self.w3s[i]))
-                        return self.w3s[i].use()
-                    if next_available is None or tau < next_available.usable_in():
-                        next_available = self.w3s[i]
-
-                if next_available is None:
-                    raise Exception("No Web3 instance found")
-                sleep = next_available.usable_in()
-                if sleep <= 0:
+                        self.__mark_used(w3, request_type)
+                        self.__update(w3)
+                        return w3, 0
+                    return w3, tau
+        raise Exception("Target w3 '{}' not found".format(w3_target))
+
+    def _observe_wait(self, w3: W3, start: float, request_type: Union[str, None]):
+        """
+        Record the time spent waiting for a rate limited slot
+        """
+        if self.metrics is None:
+            return
+        wait = time.time() - start
+        self.metrics.observe('pool_wait_seconds', wait, provider=w3.label)
+        if wait > 0.001:
+            self.metrics.emit('rate_limit_wait', provider=w3.label, request_type=request_type, wait=wait)
+
+    def report(self, w3: W3, latency: Union[float, None] = None, exception: Union[Exception, None] = None):
+        """
+        Record the outcome of a call made with w3 (latency EWMA, error rate EWMA and circuit breaker)
+        :param w3: W3 instance used
+        :param latency: duration of the call in seconds (successful call)
+        :param exception: exception raised by the call (failed call)
+        """
+        with self.condition:
+            alpha = W3Pool.EWMA_ALPHA
+            if exception is None:
+                w3.failures = 0
+                w3.open_until = 0
+                w3.error_rate *= 1 - alpha
+                if latency is not None:
+                    w3.latency = latency if w3.latency is None else alpha * latency + (1 - alpha) * w3.latency
+                    self.latencies.append(latency)
+            else:
+                w3.failures += 1
+                w3.error_rate = alpha + (1 - alpha) * w3.error_rate
+                if w3.failures >= self.failure_threshold and self.__can_eject(w3):
+                    opened = w3.open_until <= time.time()
+                    w3.open_until = time.time() + self.circuit_cooldown
+                    if self.metrics is not None and opened:
+                        self.metrics.inc('pool_circuit_open_total', provider=w3.label)
                     if self.logger is not None:
-                        self.logger.debug("Using {}".format(next_available))
-                    return next_available.use()
+                        self.logger.warning("{} ejected for {}s after {} failures: {}".format(w3, self.circuit_cooldown, w3.failures, exception))
+            self.__update(w3)
+            self.condition.notify_all()
+        if self.metrics is not None:
+            self.metrics.inc('pool_requests_total', provider=w3.label, status='success' if exception is None else 'error')
+            if latency is not None:
+                self.metrics.observe('pool_latency_seconds', latency, provider=w3.label)
+            self.metrics.set('pool_error_rate', w3.error_rate, provider=w3.label)
+            self.metrics.emit('provider_call', provider=w3.label, latency=latency, exception=exception)
 
-            next_available = None
-            if block:
-                if self.logger is not None:
-                    self.logger.warning("Waiting {}s for a slot".format(sleep))
-                time.sleep(sleep)
-        else:
-            return None
+    def hedge_delay(self) -> Union[float, None]:
+        """
+        :return: delay after which a call is hedged (None if hedging is disabled or not enough latency samples)
+        """
+        with self.lock:
+            if self.hedge_percentile is None or len(self.latencies) < self.hedge_min_samples:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(self.hedge_percentile * len(latencies)))]
+
+    def __measure(self, func: Callable[[W3], Any], w3: W3, is_provider_error: Union[Callable[[Exception], bool], None]) -> Any:
+        start = time.time()
+        try:
+            result = func(w3)
+        except Exception as e:
+            if is_provider_error is None or is_provider_error(e):
+                self.report(w3, exception=e)
+            raise
+        self.report(w3, latency=time.time() - start)
+        return result
+
+    def __measure_hedged(self, func: Callable[[W3], Any], w3: W3, is_provider_error: Union[Callable[[Exception], bool], None]) -> Any:
+        try:
+            return self.__measure(func, w3, is_provider_error)
+        finally:
+            self.hedge_slots.release()
+
+    def __submit_hedged(self, func: Callable[[W3], Any], w3: W3, is_provider_error: Union[Callable[[Exception], bool], None]) -> concurrent.futures.Future:
+        """
+        Run func in the hedge thread pool (a hedge slot must be held)
+        """
+        with self.lock:
+            if self.hedge_executor is None:
+                self.hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.hedge_max_workers, thread_name_prefix='W3Pool-hedge')
+        return self.hedge_executor.submit(self.__measure_hedged, func, w3, is_provider_error)
+
+    def run(self, func: Callable[[W3], Any], w3: Union[W3, None] = None, request_type: Union[str, None] = None, is_provider_error: Union[Callable[[Exception], bool], None] = None) -> Any:
+        """
+        Call func with a W3 instance, recording latency and errors. If hedging is enabled and func takes longer than W3Pool.hedge_delay(), func is
+        also called with a second W3 instance and the first successful answer is returned
+        :param func: function making the RPC call
+        :param w3: (optional) W3 instance already acquired for the call
+        :param request_type: (optional) request type used to weight the call (see W3.weights)
+        :param is_provider_error: (optional) filter exceptions counting as provider failures (default: all exceptions)
+        :return: result of func
+        """
+        if w3 is None:
+            w3 = self.acquire(request_type=request_type)
+        delay = self.hedge_delay()
+        if delay is None or len(self.w3s) < 2 or not self.hedge_slots.acquire(blocking=False):
+            return self.__measure(func, w3, is_provider_error)
+
+        primary = self.__submit_hedged(func, w3, is_provider_error)
+        done, _ = concurrent.futures.wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        if not self.hedge_slots.acquire(blocking=False):
+            return primary.result()
+        hedge_w3 = self.acquire(block=False, request_type=request_type, exclude=w3)
+        if hedge_w3 is None:
+            self.hedge_slots.release()
+            return primary.result()
+        if self.logger is not None:
+            self.logger.debug("Hedging call to {} after {}s".format(hedge_w3, delay))
+        if self.metrics is not None:
+            self.metrics.inc('pool_hedges_total', provider=hedge_w3.label)
+        pending = {primary, self.__submit_hedged(func, hedge_w3, is_provider_error)}
+        exception = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                exception = future.exception()
+        raise exception
+
+
+class AsyncW3Pool(W3Pool):
+    """
+    Pool of W3 instances wrapping AsyncWeb3 instances. Waiting for a slot does not block the event loop
+    """
+
+    async def use_specific(self, w3_target: Union[W3, str], block: bool = True, request_type: Union[str, None] = None):
+        start = time.time()
+        while True:
+            target, sleep = self._try_acquire_specific(w3_target, request_type)
+            if sleep <= 0:
+                self._observe_wait(target, start, request_type)
+                return target.web3
+            if not block:
+                return None
+            if self.logger is not None:
+                self.logger.warning("Waiting {}s for {}".format(sleep, target))
+            await asyncio.sleep(sleep)
+
+    async def use(self, block: bool = True, request_type: Union[str, None] = None):
+        """
+        Return an AsyncWeb3 instance that will not hit the rate limit upon calling (may wait until the rate limit windows has passed)
+        :param block: (default: true) wait until an AsyncWeb3 instance is available
+        :param request_type: (optional) request type used to weight the call (see W3.weights)
+        :return: AsyncWeb3 instance
+        """
+        w3 = await self.acquire(block, request_type)
+        return None if w3 is None else w3.web3
+
+    async def acquire(self, block: bool = True, request_type: Union[str, None] = None, exclude: Union[W3, None] = None) -> Union[W3, None]:
+        """
+        Same as AsyncW3Pool.use() but return the W3 instance
+        :param block: (default: true) wait until a W3 instance is available
+        :param request_type: (optional) request type used to weight the call (see W3.weights)
+        :param exclude: (optional) W3 instance not to return
+        :return: W3 instance
+        """
+        start = time.time()
+        while True:
+            w3, sleep = self._try_acquire(request_type, exclude)
+            if w3 is not None:
+                self._observe_wait(w3, start, request_type)
+                return w3
+            if not block:
+                return None
+            if self.logger is not None:
+                self.logger.warning("Waiting {}s for a slot".format(sleep))
+            await asyncio.sleep(sleep)
+
+    async def __measure_async(self, func: Callable[[W3], Awaitable[Any]], w3: W3, is_provider_error: Union[Callable[[Exception], bool], None]) -> Any:
+        start = time.time()
+        try:
+            result = await func(w3)
+        except Exception as e:
+            if is_provider_error is None or is_provider_error(e):
+                self.report(w3, exception=e)
+            raise
+        self.report(w3, latency=time.time() - start)
+        return result
+
+    async def run(self, func: Callable[[W3], Awaitable[Any]], w3: Union[W3, None] = None, request_type: Union[str, None] = None, is_provider_error: Union[Callable[[Exception], bool], None] = None) -> Any:
+        """
+        Await func with a W3 instance, recording latency and errors. Hedged like W3Pool.run()
+        :param func: coroutine function making the RPC call
+        :param w3: (optional) W3 instance already acquired for the call
+        :param request_type: (optional) request type used to weight the call (see W3.weights)
+        :param is_provider_error: (optional) filter exceptions counting as provider failures (default: all exceptions)
+        :return: result of func
+        """
+        if w3 is None:
+            w3 = await self.acquire(request_type=request_type)
+        delay = self.hedge_delay()
+        if delay is None or len(self.w3s) < 2:
+            return await self.__measure_async(func, w3, is_provider_error)
 
+        primary = asyncio.ensure_future(self.__measure_async(func, w3, is_provider_error))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        hedge_w3 = await self.acquire(block=False, request_type=request_type, exclude=w3)
+        if hedge_w3 is None:
+            return await primary
+        if self.logger is not None:
+            self.logger.debug("Hedging call to {} after {}s".format(hedge_w3, delay))
+        if self.metrics is not None:
+            self.metrics.inc('pool_hedges_total', provider=hedge_w3.label)
+        pending = {primary, asyncio.ensure_future(self.__measure_async(func, hedge_w3, is_provider_error))}
+        exception = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                exception = future.exception()
+        raise exception
@@ -0,0 +1,43 @@
+import pytest
+from web3 import AsyncWeb3
+
+from benchmarks.mock_node import erc20_node
+from w3multicall.multicall import W3Multicall
+from w3multicall.w3.w3 import W3, W3Pool, AsyncW3Pool
+from w3multicall.w3.http_transport import W3HTTPTransport
+
+BALANCE_OF = W3Multicall.CallTemplate.of('balanceOf(address)(uint256)')
+TOKEN = '0x{:040x}'.format(1)
+
+
+@pytest.fixture
+def node(request):
+    """
+    erc20_node, configured with the MockNode options of an indirect parametrization (Example: {'gas_limit': 120000})
+    """
+    with erc20_node(**getattr(request, 'param', {})) as node:
+        yield node
+
+
+@pytest.fixture
+def balance_of():
+    """
+    :return: function building the balanceOf(holder) call of the first token, whose result is the holder at block 0
+    """
+    return lambda holder: BALANCE_OF.call(TOKEN, '0x{:040x}'.format(holder))
+
+
+@pytest.fixture
+def pool(node):
+    """
+    :return: function building a W3Pool of a single unthrottled W3HTTPTransport to node (kwargs are W3 options)
+    """
+    return lambda **kwargs: W3Pool([W3(W3HTTPTransport(node.endpoint_uri), rate=1e6, burst=1e6, **kwargs)])
+
+
+@pytest.fixture
+def async_pool(node):
+    """
+    :return: function building an AsyncW3Pool of a single unthrottled AsyncWeb3 to node (kwargs are W3 options)
+    """
+    return lambda **kwargs: AsyncW3Pool([W3(AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(node.endpoint_uri)), rate=1e6, burst=1e6, **kwargs)])
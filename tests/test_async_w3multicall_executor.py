@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from benchmarks.mock_node import MULTICALL3_ADDRESS
+from w3multicall.multicall import W3Multicall
+from w3multicall.asyncio.async_w3multicall_executor import AsyncW3MulticallExecutor
+
+
+def test_cancel_pending(node, async_pool, balance_of):
+    async def main():
+        executor = AsyncW3MulticallExecutor(async_pool(), 2, MULTICALL3_ADDRESS, tick_duration=10)
+        futures = [executor.submit(balance_of(i)) for i in range(3)]
+        futures[0].cancel()
+        executor.cancel_pending()
+        assert all(future.cancelled() for future in futures)
+        assert await asyncio.wait_for(executor.submit(balance_of(5), block_identifier=0, priority=AsyncW3MulticallExecutor.PRIORITY_HIGH), 5) == 5
+    asyncio.run(main())
+    assert node.stats['eth_calls'] == 1
+
+
+
+def test_dedup_join_on_split_task(node, async_pool, balance_of):
+    async def main():
+        executor = AsyncW3MulticallExecutor(async_pool(max_batch_size=1), 1, MULTICALL3_ADDRESS, tick_duration=0.01)
+        futures = [executor.submit(balance_of(i), block_identifier=0) for i in range(1, 4)]
+        assert await asyncio.wait_for(futures[0], 5) == 1
+        duplicate = executor.submit(balance_of(1), block_identifier=0)  # the first slot is resolved while the task still runs
+        assert await asyncio.wait_for(duplicate, 5) == 1
+        assert await asyncio.wait_for(asyncio.gather(*futures), 5) == [1, 2, 3]
+    asyncio.run(main())
+    assert node.stats['calls'] == 4  # a resolved slot is not joined: the duplicate is sent again
+
+
+@pytest.mark.parametrize('node', [{'gas_limit': 4 * 30000}, {'max_response_bytes': 4 * 32 + 64}], indirect=True)
+def test_bisection(async_pool, balance_of):
+    async def main():
+        executor = AsyncW3MulticallExecutor(w3_pool, 1, MULTICALL3_ADDRESS, batch_max_size=10, tick_duration=0.05)
+        futures = [executor.submit(balance_of(i), block_identifier=0) for i in range(10)]
+        return await asyncio.wait_for(asyncio.gather(*futures), 10)
+    w3_pool = async_pool()
+    assert asyncio.run(main()) == list(range(10))
+    assert w3_pool.w3s[0].max_batch_size < 10  # learned from the failed batches
+    assert w3_pool.w3s[0].failures == 0
+
+
+@pytest.mark.parametrize('node', [{}, {'gas_limit': 4 * 30000}], indirect=True)
+def test_submit_call_batch(node, async_pool):
+    async def main():
+        executor = AsyncW3MulticallExecutor(async_pool(), 2, MULTICALL3_ADDRESS, batch_max_size=10, tick_duration=10)
+        batch = W3Multicall.CallBatch.build('balanceOf(address)(uint256)', '0x{:040x}'.format(1), ['0x{:040x}'.format(i) for i in range(25)])
+        return await asyncio.wait_for(executor.submit_batch(batch, block_identifier=0), 10)
+    results = asyncio.run(main())
+    assert isinstance(results, W3Multicall.LazyResults) and list(results) == list(range(25))
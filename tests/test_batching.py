@@ -0,0 +1,28 @@
+import pytest
+import requests
+from web3.exceptions import ContractCustomError
+
+from w3multicall.batching import W3MulticallBatcher, _is_payload_too_large_error
+
+
+def http_error(status_code: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError("{} Client Error".format(status_code), response=response)
+
+
+@pytest.mark.parametrize('error, payload_too_large', [
+    (http_error(413), True),
+    (http_error(429), False),
+    (Exception("response size exceeded (1024 > 512 bytes)"), True),
+    (Exception("Request Entity Too Large"), True),
+    (Exception("execution reverted: order 413 payload rejected"), False),
+    (ContractCustomError("0x413payload"), False),
+])
+def test_is_payload_too_large_error(error, payload_too_large):
+    assert _is_payload_too_large_error(error) == payload_too_large
+
+
+def test_batcher_is_abstract():
+    with pytest.raises(TypeError):
+        W3MulticallBatcher('0x' + '0' * 40, 20, 0.05, None, True, 'aggregate', None, None, 50000, True, None, None, None, None)
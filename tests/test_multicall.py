@@ -0,0 +1,95 @@
+import pytest
+import eth_utils
+from eth_abi import encode
+from eth_abi.exceptions import EncodingError, ValueOutOfBounds
+
+from w3multicall.multicall import W3Multicall, _encode_aggregate_data, _encode_try_aggregate_data, _encode_aggregate3_data, _decode_aggregate_output, \
+    _decode_try_aggregate_output
+
+TEMPLATE = W3Multicall.CallTemplate.of('f()(uint256)')
+CALLDATA = [b'', b'\x01\x02\x03', bytes(range(4)), bytes(range(36)), bytes(range(64))]  # empty, shorter than a word, not a multiple of 32 bytes, multiple of 32 bytes
+OUTPUTS = [b'', b'\xff', bytes(range(33)), bytes(range(64))]
+
+
+def calls(datas=CALLDATA):
+    return [W3Multicall.Call.of_encoded('0x{:040x}'.format(i + 1), TEMPLATE, data) for i, data in enumerate(datas)]
+
+
+@pytest.mark.parametrize('datas', [CALLDATA, []])
+def test_encode_aggregate(datas):
+    expected = W3Multicall.MULTICALL_SELECTOR + encode(['(address,bytes)[]'], [[(call.address, call.data) for call in calls(datas)]])
+    assert _encode_aggregate_data(W3Multicall.MULTICALL_SELECTOR, calls(datas)) == expected
+
+
+@pytest.mark.parametrize('require_success', [True, False])
+@pytest.mark.parametrize('datas', [CALLDATA, []])
+def test_encode_try_aggregate(datas, require_success):
+    expected = W3Multicall.TRY_AGGREGATE_SELECTOR + encode(['bool', '(address,bytes)[]'], [require_success, [(call.address, call.data) for call in calls(datas)]])
+    assert _encode_try_aggregate_data(W3Multicall.TRY_AGGREGATE_SELECTOR, require_success, calls(datas)) == expected
+
+
+@pytest.mark.parametrize('datas', [CALLDATA, []])
+def test_encode_aggregate3(datas):
+    allow_failures = [i % 2 == 0 for i in range(len(datas))]
+    expected = W3Multicall.AGGREGATE3_SELECTOR + encode(['(address,bool,bytes)[]'], [[(call.address, allow_failure, call.data) for call, allow_failure in zip(calls(datas), allow_failures)]])
+    assert _encode_aggregate3_data(W3Multicall.AGGREGATE3_SELECTOR, calls(datas), allow_failures) == expected
+
+
+@pytest.mark.parametrize('outputs', [OUTPUTS, []])
+def test_decode_aggregate(outputs):
+    block_number, decoded = _decode_aggregate_output(encode(['uint256', 'bytes[]'], [17000000, outputs]))
+    assert block_number == 17000000 and [bytes(output) for output in decoded] == outputs
+
+
+@pytest.mark.parametrize('outputs', [OUTPUTS, []])
+def test_decode_try_aggregate(outputs):
+    results = [(i % 2 == 0, output) for i, output in enumerate(outputs)]
+    decoded = _decode_try_aggregate_output(encode(['(bool,bytes)[]'], [results]))
+    assert [(success, bytes(output)) for success, output in decoded] == results
+
+
+@pytest.mark.parametrize('response', [
+    b'',
+    encode(['uint256', 'bytes[]'], [1, OUTPUTS])[:-40],  # truncated
+    encode(['uint256', 'uint256'], [1, 2 ** 200]),  # array offset out of bounds
+    encode(['uint256', 'uint256', 'uint256'], [1, 64, 5]),  # more elements than the response holds
+])
+def test_decode_aggregate_malformed(response):
+    with pytest.raises(Exception, match='Invalid multicall response'):
+        _decode_aggregate_output(response)
+
+
+@pytest.mark.parametrize('response', [
+    b'\x00' * 31,
+    encode(['(bool,bytes)[]'], [[(True, b'\x01' * 40)]])[:-32],  # truncated bytes
+    encode(['uint256', 'uint256', 'uint256'], [32, 1, 2 ** 64]),  # element offset out of bounds
+])
+def test_decode_try_aggregate_malformed(response):
+    with pytest.raises(Exception, match='Invalid multicall response'):
+        _decode_try_aggregate_output(response)
+
+
+@pytest.mark.parametrize('signature, args', [
+    ('f(uint8)(uint256)', [1, 255]),
+    ('f(int16)(uint256)', [-32768, 32767]),
+    ('f(bool)(uint256)', [True, False]),
+    ('f(bytes32)(uint256)', [b'\x01' * 32, b'\x02']),
+    ('f(address,uint256)(uint256)', [('0x' + 'ab' * 20, 0), ('0x' + 'AB' * 20, 2 ** 256 - 1), (eth_utils.to_checksum_address('0x' + 'ab' * 20), 1)]),
+])
+def test_call_batch_build_matches_call(signature, args):
+    batch = W3Multicall.CallBatch.build(signature, '0x' + '11' * 20, args)
+    assert [call.data for call in batch] == [W3Multicall.Call('0x' + '11' * 20, signature, arg if isinstance(arg, tuple) else [arg]).data for arg in args]
+
+
+@pytest.mark.parametrize('signature, arg, error', [
+    ('f(uint8)(uint256)', 300, ValueOutOfBounds),
+    ('f(uint256)(uint256)', -1, ValueOutOfBounds),
+    ('f(int8)(uint256)', 128, ValueOutOfBounds),
+    ('f(uint256)(uint256)', True, EncodingError),
+    ('f(bool)(uint256)', 1, EncodingError),
+    ('f(bytes32)(uint256)', b'\x01' * 33, ValueOutOfBounds),
+    ('f(address)(uint256)', '0xAb' + 'ab' * 19, Exception),
+])
+def test_call_batch_build_validates_args(signature, arg, error):
+    with pytest.raises(error):
+        W3Multicall.CallBatch.build(signature, '0x' + '11' * 20, [arg])
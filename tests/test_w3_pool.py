@@ -0,0 +1,88 @@
+import time
+
+import pytest
+from web3.exceptions import ContractLogicError
+
+from benchmarks.mock_node import MULTICALL3_ADDRESS
+from w3multicall.batching import _is_provider_error
+from w3multicall.multicall import W3Multicall
+from w3multicall.w3.w3 import W3, W3Pool
+from w3multicall.w3.json_rpc import JsonRpcError
+from w3multicall.threading.w3multicall_executor import W3MulticallExecutor
+
+
+def fail(w3: W3):
+    raise ConnectionError("connection refused")
+
+
+@pytest.mark.parametrize('error, provider_error', [
+    (ContractLogicError("execution reverted: bad token"), False),
+    (JsonRpcError("reverted", 3), False),
+    (ValueError({'code': 3, 'message': 'execution reverted', 'data': '0x'}), False),
+    (JsonRpcError("out of gas: gas required exceeds allowance", -32000), False),
+    (JsonRpcError("header not found", -32000), True),
+    (ConnectionError("connection refused"), True),
+])
+def test_is_provider_error(error, provider_error):
+    assert _is_provider_error(error) == provider_error
+
+
+def test_revert_does_not_eject_provider(pool, balance_of):
+    w3_pool = pool()
+    w3 = w3_pool.w3s[0]
+    with W3MulticallExecutor(w3_pool, 2, MULTICALL3_ADDRESS, tick_duration=0.01) as executor:
+        for _ in range(2 * w3_pool.failure_threshold):
+            with pytest.raises(Exception, match='execution reverted'):
+                executor.submit(W3Multicall.Call('0x' + '9' * 40, 'f()(uint256)'), block_identifier=0).result(timeout=5)
+        assert w3.failures == 0 and w3.open_until == 0
+        assert executor.submit(balance_of(3), block_identifier=0).result(timeout=5) == 3
+
+
+def test_last_provider_not_ejected():
+    w3s = [W3(object(), rate=1e6, burst=1e6, label=label) for label in ('a', 'b')]
+    w3_pool = W3Pool(w3s, failure_threshold=2)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            w3_pool.run(fail, w3s[0])
+    assert w3s[0].open_until > time.time()
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            w3_pool.run(fail, w3s[1])
+    assert w3s[1].failures == 4 and w3s[1].open_until == 0
+    assert w3_pool.acquire(block=False) is w3s[1]
+
+
+def test_acquire_first_available():
+    w3s = [W3(object(), rate=1, burst=1, label=str(i)) for i in range(3)]
+    w3_pool = W3Pool(w3s)
+    assert {w3_pool.acquire(block=False).label for _ in range(3)} == {'0', '1', '2'}
+    assert w3_pool.acquire(block=False) is None
+    assert 0 < w3_pool._try_acquire()[1] <= 1
+
+
+def test_acquire_exclude():
+    w3s = [W3(object(), rate=1e6, burst=1e6, label=str(i)) for i in range(3)]
+    w3_pool = W3Pool(w3s)
+    assert all(w3_pool.acquire(block=False, exclude=w3s[0]) is not w3s[0] for _ in range(10))
+    with pytest.raises(Exception, match='No Web3 instance found'):
+        W3Pool(w3s[:1]).acquire(block=False, exclude=w3s[0])
+
+
+def test_acquire_latency_aware():
+    w3s = [W3(object(), rate=1e6, burst=1e6, label=label) for label in ('slow', 'fast', 'unknown')]
+    w3_pool = W3Pool(w3s, latency_aware=True)
+    w3_pool.report(w3s[0], latency=0.5)
+    w3_pool.report(w3s[1], latency=0.05)
+    w3_pool.report(w3s[2], latency=0.1)
+    assert [w3_pool.acquire(block=False).label for _ in range(3)] == ['fast'] * 3
+    w3_pool.report(w3s[1], exception=ConnectionError("connection refused"))
+    w3_pool.report(w3s[1], latency=1)
+    assert w3_pool.acquire(block=False).label == 'unknown'
+
+
+def test_heap_stays_bounded():
+    w3s = [W3(object(), rate=1e6, burst=1e6) for _ in range(4)]
+    w3_pool = W3Pool(w3s, latency_aware=True)
+    for i in range(1000):
+        w3_pool.report(w3_pool.acquire(), latency=0.01 * (i % 7))
+    assert len(w3_pool.heap) + len(w3_pool.ready_heap) <= 2 * len(w3s) + 16
@@ -0,0 +1,117 @@
+import concurrent.futures
+import time
+
+import pytest
+from web3 import Web3
+
+from benchmarks.mock_node import MULTICALL3_ADDRESS
+from w3multicall.multicall import W3Multicall
+from w3multicall.w3.w3 import W3, W3Pool
+from w3multicall.threading.w3multicall_executor import W3MulticallExecutor
+
+
+def test_cancel_is_idempotent(pool, balance_of):
+    with W3MulticallExecutor(pool(), 2, MULTICALL3_ADDRESS, tick_duration=10) as executor:
+        future = executor.submit(balance_of(1))
+        assert future.cancel()
+        assert future.cancel()
+        done, not_done = concurrent.futures.wait([future], timeout=1)
+        assert done == {future} and not not_done
+        with pytest.raises(concurrent.futures.CancelledError):
+            future.result()
+
+
+def test_cancel_pending(node, pool, balance_of):
+    with W3MulticallExecutor(pool(), 2, MULTICALL3_ADDRESS, tick_duration=10) as executor:
+        futures = [executor.submit(balance_of(i)) for i in range(3)]
+        futures[0].cancel()
+        executor.cancel_pending()
+        assert all(future.cancelled() for future in futures)
+        assert executor.submit(balance_of(5), block_identifier=0, priority=W3MulticallExecutor.PRIORITY_HIGH).result(timeout=5) == 5
+    assert node.stats['eth_calls'] == 1
+
+
+def test_cancel_pending_skips_done_futures(pool, balance_of):
+    with W3MulticallExecutor(pool(), 2, MULTICALL3_ADDRESS, tick_duration=0.01) as executor:
+        done = executor.submit(balance_of(2), block_identifier=0)
+        assert done.result(timeout=5) == 2
+        executor.cancel_pending()
+        assert not done.cancelled() and done.result() == 2
+
+
+
+def test_dedup_shares_pending_slot(node, pool, balance_of):
+    with W3MulticallExecutor(pool(), 1, MULTICALL3_ADDRESS, tick_duration=0.05) as executor:
+        futures = [executor.submit(balance_of(7), block_identifier=0) for _ in range(3)]
+        assert [future.result(timeout=5) for future in futures] == [7, 7, 7]
+    assert node.stats['calls'] == 1
+
+
+@pytest.mark.parametrize('node', [{'latency': 0.2}], indirect=True)
+def test_dedup_join_on_split_task(node, pool, balance_of):
+    with W3MulticallExecutor(pool(max_batch_size=1), 1, MULTICALL3_ADDRESS, tick_duration=0.01) as executor:
+        futures = [executor.submit(balance_of(i), block_identifier=0) for i in range(1, 4)]
+        while node.stats['eth_calls'] == 0:
+            time.sleep(0.01)
+        # the task is split in 3 multicalls: the first one is answered but the task still runs, so its Futures are not resolved yet
+        duplicate = executor.submit(balance_of(1), block_identifier=0)
+        assert duplicate.result(timeout=5) == 1
+        assert [future.result(timeout=5) for future in futures] == [1, 2, 3]
+    assert node.stats['calls'] == 3
+
+
+@pytest.mark.parametrize('node', [{'gas_limit': 4 * 30000}, {'max_response_bytes': 4 * 32 + 64}], indirect=True)
+def test_bisection(pool, balance_of):
+    w3_pool = pool()
+    with W3MulticallExecutor(w3_pool, 1, MULTICALL3_ADDRESS, batch_max_size=10, tick_duration=0.05) as executor:
+        futures = [executor.submit(balance_of(i), block_identifier=0) for i in range(10)]
+        assert [future.result(timeout=10) for future in futures] == list(range(10))
+    assert w3_pool.w3s[0].max_batch_size < 10  # learned from the failed batches
+    assert w3_pool.w3s[0].failures == 0
+
+
+def test_json_rpc_batch(node, pool, balance_of):
+    with W3MulticallExecutor(pool(), 1, MULTICALL3_ADDRESS, batch_max_size=2, tick_duration=0.05, json_rpc_batch_size=4) as executor:
+        futures = [executor.submit(balance_of(i), block_identifier=0) for i in range(8)]
+        assert [future.result(timeout=5) for future in futures] == list(range(8))
+    assert node.stats['eth_calls'] == 4 and node.stats['requests'] < 4
+
+
+def call_batch(count):
+    return W3Multicall.CallBatch.build('balanceOf(address)(uint256)', '0x{:040x}'.format(1), ['0x{:040x}'.format(i) for i in range(count)])
+
+
+def test_submit_call_batch(node, pool):
+    with W3MulticallExecutor(pool(), 2, MULTICALL3_ADDRESS, batch_max_size=10, tick_duration=10) as executor:
+        results = executor.submit_batch(call_batch(25), block_identifier=0).result(timeout=5)
+    assert isinstance(results, W3Multicall.LazyResults) and list(results) == list(range(25)) and results.block_number == 0
+    assert node.stats['eth_calls'] == 3  # slices of batch_max_size, sent without lingering
+
+
+@pytest.mark.parametrize('node', [{'gas_limit': 4 * 30000}], indirect=True)
+def test_submit_call_batch_bisection(pool):
+    w3_pool = pool()
+    with W3MulticallExecutor(w3_pool, 1, MULTICALL3_ADDRESS, batch_max_size=10) as executor:
+        assert list(executor.submit_batch(call_batch(10), block_identifier=0).result(timeout=10)) == list(range(10))
+    assert w3_pool.w3s[0].max_batch_size < 10 and w3_pool.w3s[0].failures == 0
+
+
+def test_submit_call_batch_json_rpc_batch(node, pool):
+    with W3MulticallExecutor(pool(), 1, MULTICALL3_ADDRESS, batch_max_size=5, json_rpc_batch_size=4) as executor:
+        assert list(executor.submit_batch(call_batch(20), block_identifier=0).result(timeout=5)) == list(range(20))
+    assert node.stats['eth_calls'] == 4 and node.stats['requests'] < 4
+
+
+def test_submit_call_batch_deadline(node, pool):
+    with W3MulticallExecutor(pool(), 1, MULTICALL3_ADDRESS, batch_max_size=5) as executor:
+        future = executor.submit_batch(call_batch(20), deadline=time.time() - 1)
+        with pytest.raises(concurrent.futures.TimeoutError):
+            future.result(timeout=5)
+        assert len(executor.submit_batch(call_batch(0)).result(timeout=5)) == 0
+    assert node.stats['eth_calls'] == 0
+
+
+def test_json_rpc_batch_requires_http_provider():
+    w3_pool = W3Pool([W3(Web3(Web3.IPCProvider('/nonexistent.ipc')), rate=1e6, burst=1e6)])
+    with pytest.raises(Exception, match='json_rpc_batch_size'):
+        W3MulticallExecutor(w3_pool, 1, json_rpc_batch_size=4)
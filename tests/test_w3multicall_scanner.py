@@ -0,0 +1,18 @@
+import pytest
+
+from benchmarks.mock_node import MULTICALL3_ADDRESS
+from w3multicall.threading.w3multicall_scanner import W3MulticallScanner
+
+
+def test_scan(node, pool, balance_of):
+    node.mine(3)
+    with W3MulticallScanner(pool(), 2, MULTICALL3_ADDRESS) as scanner:
+        assert list(scanner.scan([balance_of(2)], 0, 3)) == [(block, [2 + block]) for block in range(4)]
+
+
+def test_node_errors_do_not_count_against_provider(node, pool, balance_of):
+    w3_pool = pool()
+    with W3MulticallScanner(w3_pool, 2, MULTICALL3_ADDRESS, retries=w3_pool.failure_threshold + 1) as scanner:
+        with pytest.raises(Exception, match='header not found'):
+            list(scanner.scan([balance_of(2)], 5, 5))
+    assert w3_pool.w3s[0].failures == 0
@@ -0,0 +1,68 @@
+import pytest
+
+from benchmarks.mock_node import MULTICALL3_ADDRESS
+from w3multicall.multicall import W3Multicall
+from w3multicall.threading.w3multicall_watcher import W3MulticallWatcher
+
+
+def test_node_errors_do_not_count_against_provider(pool):
+    w3_pool = pool()
+    watcher = W3MulticallWatcher(w3_pool, [W3Multicall.Call('0x' + '9' * 40, 'f()(uint256)')], MULTICALL3_ADDRESS, require_success=True)
+    for _ in range(w3_pool.failure_threshold + 1):
+        with pytest.raises(Exception, match='execution reverted'):
+            watcher.poll()
+    assert w3_pool.w3s[0].failures == 0
+
+
+@pytest.fixture
+def watcher(node, pool):
+    node.register('0x{:040x}'.format(1), 'price()(uint256)', lambda block: 100 + block + 1000 * node.fork)
+    calls = [W3Multicall.Call('0x{:040x}'.format(1), 'price()(uint256)'), W3Multicall.Call('0x{:040x}'.format(1), 'decimals()(uint8)')]
+    return W3MulticallWatcher(pool(), calls, MULTICALL3_ADDRESS, max_catch_up=4)
+
+
+def test_first_poll_emits_all_calls(watcher):
+    updates = watcher.poll()
+    assert [(update.block_number, [(change.index, change.value) for change in update.changes]) for update in updates] == [(0, [(0, 100), (1, 18)])]
+    assert watcher.poll() == []
+
+
+def test_poll_emits_every_new_block(node, watcher):
+    watcher.poll()
+    node.mine(3)
+    updates = watcher.poll()
+    assert [update.block_number for update in updates] == [1, 2, 3]
+    assert all(update.parent_hash == previous.block_hash for previous, update in zip(updates, updates[1:]))
+    assert [[(change.index, change.previous, change.value) for change in update.changes] for update in updates] == [[(0, 100, 101)], [(0, 101, 102)], [(0, 102, 103)]]
+    assert not any(update.reorg for update in updates)
+
+
+def test_catch_up_is_bounded(node, watcher):
+    watcher.poll()
+    node.mine(10)
+    updates = watcher.poll()
+    assert [update.block_number for update in updates] == [7, 8, 9, 10]
+    assert not updates[0].reorg and updates[0].changes[0].previous == 100
+
+
+def test_reorg(node, watcher):
+    watcher.poll()
+    node.mine(4)
+    orphaned = [update.block_hash for update in watcher.poll()][-2:]
+    node.reorg(2, 3)
+    updates = watcher.poll()
+    assert [update.block_number for update in updates] == [3, 4, 5]
+    assert updates[0].reorg and updates[0].removed == orphaned
+    assert not updates[1].reorg and not updates[2].reorg
+    assert updates[0].changes[0].value == 1103
+
+
+def test_reorg_beyond_skipped_blocks(node, watcher):
+    watcher.poll()
+    node.mine(4)
+    orphaned = [update.block_hash for update in watcher.poll()][-1:]
+    node.reorg(1)
+    node.mine(8)
+    updates = watcher.poll()
+    assert [update.block_number for update in updates] == [9, 10, 11, 12]
+    assert updates[0].removed == orphaned